@@ -22,6 +22,8 @@ import asyncio
 import random
 import os
 import json
+import struct
+import time
 import websockets 
 import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
@@ -73,6 +75,111 @@ except Exception as e:
     print(f"[ERROR] No se pudo cargar la fuente: {e}")
     PROP_PIX = None
 
+# Formato binario de la estación (ver Raspberry/protocolo_bin.py)
+SUBPROTOCOLO = "clima.bin.v1"
+TIPO_MUESTRA = 0x01
+TIPO_HISTORIAL = 0x02
+TIPO_HISTORIAL_DELTA = 0x03
+MUESTRA_FORMATO = "<BBhIHB"
+HISTORIAL_FORMATO = "<BBHHHIH"
+REGISTRO_FORMATO = "<IhIH"
+CONDICIONES = ("normal_dia", "normal_noche", "despejado", "nublado", "lluvia",
+               "calor", "frío", "viento")
+# Segundos entre 1970-01-01 y el 1 de enero de los epochs usados por MicroPython
+EPOCH_UNIX = {1970: 0, 2000: 946684800}
+
+def leer_varint(mensaje, pos):
+    """
+    Lee un varint en zig-zag de `mensaje` a partir de `pos`.
+
+    Returns:
+        tuple: (valor con signo, posición siguiente).
+    """
+    n = 0
+    desplazamiento = 0
+    while True:
+        byte = mensaje[pos]
+        pos += 1
+        n |= (byte & 0x7F) << desplazamiento
+        if not byte & 0x80:
+            break
+        desplazamiento += 7
+    return (n >> 1) ^ -(n & 1), pos
+
+def decodificar_binario(mensaje):
+    """
+    Convierte un mensaje binario de la estación en el mismo diccionario que
+    su versión JSON.
+
+    Args:
+        mensaje (bytes): Carga útil de una trama binaria.
+
+    Returns:
+        dict: Muestra con temperatura, humedad, presion y condicion, o un
+        bloque de historial {"historial": [...], "resolucion", "cursor", "fin",
+        "truncado"}
+        con una entrada por registro y los tiempos en segundos Unix.
+
+    Raises:
+        ValueError: Si el tipo de mensaje no se reconoce.
+    """
+    tipo = mensaje[0]
+    if tipo == TIPO_MUESTRA:
+        _, canales, temp, pres, hum, cond = struct.unpack_from(MUESTRA_FORMATO, mensaje, 0)
+        datos = {}
+        if canales & 0x01:
+            datos["temperatura"] = temp / 100
+        if canales & 0x02:
+            datos["humedad"] = hum / 100
+        if canales & 0x04:
+            datos["presion"] = pres / 100
+        if canales & 0x08 and cond < len(CONDICIONES):
+            datos["condicion"] = CONDICIONES[cond]
+        return datos
+    if tipo in (TIPO_HISTORIAL, TIPO_HISTORIAL_DELTA):
+        _, banderas, epoch_anio, resolucion, n, cursor, saltar = struct.unpack_from(
+            HISTORIAL_FORMATO, mensaje, 0)
+        fin = bool(banderas & 0x02)
+        truncado = bool(banderas & 0x04)
+        if banderas & 0x01:
+            return {"historial": "no disponible", "fin": fin}
+        ajuste = EPOCH_UNIX.get(epoch_anio, 0)
+        historial = []
+        inicio = struct.calcsize(HISTORIAL_FORMATO)
+        if tipo == TIPO_HISTORIAL:
+            registros = struct.iter_unpack(REGISTRO_FORMATO, mensaje[inicio:])
+        else:
+            registros = decodificar_deltas(mensaje, inicio, n)
+        for t, temp, pres, hum in registros:
+            historial.append({
+                "t": t + ajuste,
+                "hora": time.strftime("%H:%M:%S", time.gmtime(t + ajuste)),
+                "temperatura": temp / 100,
+                "presion": pres / 100,
+                "humedad": hum / 100,
+            })
+        return {"historial": historial, "resolucion": resolucion,
+                "cursor": [cursor + ajuste, saltar] if cursor else None, "fin": fin,
+                "truncado": truncado}
+    raise ValueError(f"Tipo de mensaje binario desconocido: {tipo}")
+
+def decodificar_deltas(mensaje, pos, n):
+    """
+    Reconstruye los registros de un historial con deltas: cada canal es la
+    suma acumulada de sus diferencias.
+
+    Returns:
+        list: Tuplas (t, temperatura, presion, humedad) en enteros del dispositivo.
+    """
+    registros = []
+    valores = [0, 0, 0, 0]
+    for _ in range(n):
+        for i in range(4):
+            diferencia, pos = leer_varint(mensaje, pos)
+            valores[i] += diferencia
+        registros.append(tuple(valores))
+    return registros
+
 class WebSocketClient:
     """
     Cliente WebSocket que gestiona la conexión con el servidor de clima y comunica
@@ -104,6 +211,9 @@ class WebSocketClient:
         self.websocket = None 
         self.on_connect = None
         self.on_historial_recibido = None  # Callback
+        self.historial_horas = 24
+        self._historial_parcial = []
+        self._consulta = None
         self.send_queue = asyncio.Queue()
 
     async def iniciar_websocket(self):
@@ -113,7 +223,9 @@ class WebSocketClient:
         """
         while self.activo:
             try:
-                async with websockets.connect(self.uri, ping_interval=None, compression=None) as websocket:
+                # Se ofrece el formato binario; si el servidor no lo acepta, envía JSON
+                async with websockets.connect(self.uri, ping_interval=None, compression=None,
+                                              subprotocols=[SUBPROTOCOLO]) as websocket:
                     self.websocket = websocket
                     print("✅ Conectado al WebSocket")
                     if self.on_connect:
@@ -152,14 +264,28 @@ class WebSocketClient:
         if tipo == "real":
             self.enviar_mensaje(json.dumps({"solicitud": "real"}))
         elif tipo == "historial":
-            self.enviar_mensaje(json.dumps({"solicitud": "historial"}))
+            # Las últimas `historial_horas` horas; la estación responde en bloques.
+            # Se redondea al minuto siguiente para que la estación pueda
+            # responder desde su caché si se repite la consulta
+            ahora = int(time.time()) // 60 * 60 + 60
+            self._historial_parcial = []
+            self._consulta = {
+                "solicitud": "historial",
+                "desde": ahora - self.historial_horas * 3600,
+                "hasta": ahora,
+                "delta": True
+            }
+            self.enviar_mensaje(json.dumps(self._consulta))
 
     def on_message(self, mensaje):
         """
-        Lee los datos enviados desde el servidor
+        Lee los datos enviados desde el servidor, en JSON o en formato binario
         """
         try:
-            datos = json.loads(mensaje)
+            if isinstance(mensaje, bytes):
+                datos = decodificar_binario(mensaje)
+            else:
+                datos = json.loads(mensaje)
             tipo = self.tipo
 
             if tipo == "real":
@@ -174,8 +300,12 @@ class WebSocketClient:
                 Clock.schedule_once(lambda dt: self.actualizar_clima(temperatura, humedad, presion, condicion))
                 Clock.schedule_once(lambda dt: self.actualizar_estado(conectado, enviando, guardando))             
             elif tipo == "historial":
-                historial = []
-                for linea in datos["historial"]:
+                historial = self._historial_parcial
+                lineas = datos["historial"]
+                if not isinstance(lineas, list):
+                    print(f"⚠️ Historial {lineas}")
+                    lineas = []
+                for linea in lineas:
                     try:
                         historial.append({
                             "hora":         linea["hora"],
@@ -185,7 +315,14 @@ class WebSocketClient:
                         })
                     except Exception as e:
                         print(f"❌ Error procesando entrada: {datos} -> {e}")
-                Clock.schedule_once(lambda dt: self.on_historial_recibido(historial))
+                # La respuesta llega en varios bloques. Si la estación la corta
+                # por su límite de registros, se pide la página siguiente con
+                # el cursor; se grafica cuando llega el final del intervalo
+                if datos.get("truncado") and datos.get("cursor") and self._consulta:
+                    self.enviar_mensaje(json.dumps(dict(self._consulta, cursor=datos["cursor"])))
+                elif datos.get("fin", True):
+                    self._historial_parcial = []
+                    Clock.schedule_once(lambda dt: self.on_historial_recibido(historial))
         except Exception as e:
             print("Error al procesar mensaje:", e)
 
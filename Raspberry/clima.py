@@ -5,36 +5,39 @@ def determinar_condiciones_climaticas(temperatura, humedad, presion, gradiente_p
     Determina la condición climática basada en temperatura, humedad, presión, 
     gradiente de presión y hora del día.
 
+    Todos los valores son enteros en centésimas de su unidad, tal como los
+    entrega `BME280.read_all` (ver `unidades`).
+
     Parámetros:
-    - temperatura (float): Temperatura en grados Celsius.
-    - humedad (float): Humedad relativa en porcentaje.
-    - presion (float): Presión atmosférica en hPa.
-    - gradiente_presion (float, opcional): Diferencia de presión reciente para detectar viento.
-    - presion_anterior (float, opcional): Presión registrada anteriormente para calcular el gradiente si no se proporciona.
+    - temperatura (int): Temperatura en centésimas de grado Celsius.
+    - humedad (int): Humedad relativa en centésimas de porcentaje.
+    - presion (int): Presión atmosférica en Pa (centésimas de hPa).
+    - gradiente_presion (int, opcional): Diferencia de presión reciente en Pa para detectar viento.
+    - presion_anterior (int, opcional): Presión registrada anteriormente en Pa para calcular el gradiente si no se proporciona.
 
     Retorna:
     - str: Condición climática detectada (ej. "lluvia", "nublado", "despejado", etc.).
     """
     
     # Obtener la hora actual (formato 24h)
-    hora = time.localtime().tm_hour
+    hora = time.localtime()[3]
 
     # Calcular el gradiente de presión si no se proporcionó pero se tiene la presión anterior
     if gradiente_presion is None and presion_anterior is not None:
         gradiente_presion = presion_anterior - presion
 
     # Clasificación de condiciones según reglas heurísticas simples
-    if humedad >= 80 and presion <= 1005:
+    if humedad >= 8000 and presion <= 100500:
         return "lluvia"
-    elif 60 <= humedad < 80 and 1006 <= presion <= 1015:
+    elif 6000 <= humedad < 8000 and 100600 <= presion <= 101500:
         return "nublado"
-    elif humedad < 60 and presion >= 1015 and temperatura >= 20:
+    elif humedad < 6000 and presion >= 101500 and temperatura >= 2000:
         return "despejado"
-    elif temperatura > 30:
+    elif temperatura > 3000:
         return "calor"
-    elif temperatura < 10:
+    elif temperatura < 1000:
         return "frío"
-    elif gradiente_presion is not None and abs(gradiente_presion) > 5:
+    elif gradiente_presion is not None and abs(gradiente_presion) > 500:
         return "viento"
     elif hora >= 18 or hora < 6:
         return "normal_noche"
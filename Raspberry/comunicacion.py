@@ -1,12 +1,18 @@
 import network
 import time
-import socket
 import hashlib
 import ubinascii
 import uasyncio as asyncio
 import json
 import os
 
+import formato_bin
+import protocolo_bin
+import resumenes
+
+# Último punto de acceso al que se conectó (SSID, BSSID y canal)
+LAST_AP_PATH = "/wifi_last.json"
+
 # Archivo de configuración de Wi-Fi
 default_config = {
     "networks": [
@@ -21,7 +27,36 @@ class WiFiManager:
     Lee la configuración desde un archivo JSON o usa valores por defecto.
     Intenta conectarse a una de las redes especificadas. Soporta configuración
     IP estática si está disponible en el archivo de configuración.
+
+    La conexión es una máquina de estados asíncrona (ver `connect`): el
+    estado del enlace se consulta cada `POLL_MS` cediendo el bucle de eventos,
+    las redes se prueban en orden de RSSI a partir de un escaneo en caché y,
+    si ninguna responde, el siguiente intento se pospone con espera exponencial.
+
+    La configuración se guarda ya interpretada y solo se vuelve a leer si
+    cambian el tamaño o la fecha de modificación del archivo. El último punto
+    de acceso que funcionó se guarda en `LAST_AP_PATH` y al reconectar se
+    prueba primero directamente por BSSID y canal, sin escanear.
+
+    Atributos:
+        state (str): Estado actual: 'desconectado', 'escaneando', 'conectando',
+            'conectado' o 'espera'.
     """
+    # Estados de la máquina de conexión
+    DESCONECTADO = 'desconectado'
+    ESCANEANDO = 'escaneando'
+    CONECTANDO = 'conectando'
+    CONECTADO = 'conectado'
+    ESPERA = 'espera'
+
+    # Intervalo de consulta del estado y tiempo máximo por red (ms)
+    POLL_MS = 250
+    CONNECT_TIMEOUT_MS = 15000
+    # Validez del escaneo en caché (ms)
+    SCAN_TTL_MS = 5 * 60 * 1000
+    # Límite de la espera exponencial entre intentos (s)
+    MAX_BACKOFF_S = 300
+
     def __init__(self):
         """
         Inicializa el administrador Wi-Fi.
@@ -32,12 +67,26 @@ class WiFiManager:
         self.config = None
         self.static = None
         self.networks = None
+        self.state = self.DESCONECTADO
+        # Caché del escaneo: {ssid: rssi} y momento en que se hizo (ticks_ms)
+        self._scan = None
+        self._scan_time = 0
+        # Espera exponencial: segundos actuales y plazo del próximo intento
+        self._backoff_s = 0
+        self._next_attempt = time.ticks_ms()
+        # (tamaño, mtime) del archivo de configuración ya cargado
+        self._config_stamp = None
+        # Último AP conectado: {"ssid", "bssid" (hex), "channel"}; None = sin leer
+        self._last_ap = None
         self.wlan.disconnect() 
 
     def _load_config(self, path):
         """
         Carga la configuración Wi-Fi desde un archivo JSON.
 
+        Si el archivo no cambió de tamaño ni de fecha de modificación desde la
+        última lectura, devuelve la configuración en caché sin leer la flash.
+
         Args:
             path (str): Ruta del archivo de configuración.
 
@@ -45,24 +94,170 @@ class WiFiManager:
             dict: Configuración cargada o valores por defecto.
         """
         try:
-            if path in os.listdir('/'):
-                with open(path, 'r') as f:
-                    return json.loads(f.read())
+            st = os.stat(path)
+        except OSError:
+            self._config_stamp = None
+            return default_config
+        stamp = (st[6], st[8])
+        if stamp == self._config_stamp and self.config is not None:
+            return self.config
+        try:
+            with open(path, 'r') as f:
+                config = json.loads(f.read())
+        except Exception:
+            self._config_stamp = None
+            return default_config
+        self._config_stamp = stamp
+        return config
+
+    def _load_last_ap(self):
+        """
+        Lee (una sola vez) el último punto de acceso conectado.
+
+        Returns:
+            dict: {"ssid", "bssid", "channel"}, vacío si no hay ninguno.
+        """
+        if self._last_ap is None:
+            try:
+                with open(LAST_AP_PATH, 'r') as f:
+                    self._last_ap = json.loads(f.read())
+            except Exception:
+                self._last_ap = {}
+        return self._last_ap
+
+    def _save_last_ap(self, ssid, bssid, channel):
+        """
+        Guarda el punto de acceso conectado, solo si cambió, para no desgastar la flash.
+        """
+        last = {"ssid": ssid, "bssid": bssid, "channel": channel}
+        if last == self._load_last_ap():
+            return
+        self._last_ap = last
+        try:
+            with open(LAST_AP_PATH, 'w') as f:
+                f.write(json.dumps(last))
         except Exception:
             pass
-        return default_config
 
-    def connect(self, config_path="/wifi_config.json", retry_interval=5):
+    def _scan_networks(self):
+        """
+        Devuelve el mejor AP de cada red visible, escaneando solo si la caché venció.
+
+        `wlan.scan()` bloquea mientras dura, por eso su resultado se reutiliza
+        durante `SCAN_TTL_MS` en los reintentos.
+
+        Returns:
+            dict: {ssid: (RSSI en dBm, BSSID en hex, canal)}.
+        """
+        if self._scan is not None and \
+                time.ticks_diff(time.ticks_ms(), self._scan_time) < self.SCAN_TTL_MS:
+            return self._scan
+        self.state = self.ESCANEANDO
+        scan = {}
+        try:
+            for ssid, bssid, channel, rssi, *_ in self.wlan.scan():
+                ssid = ssid.decode()
+                if ssid not in scan or rssi > scan[ssid][0]:
+                    scan[ssid] = (rssi, ubinascii.hexlify(bssid).decode(), channel)
+        except Exception:
+            pass
+        self._scan = scan
+        self._scan_time = time.ticks_ms()
+        return scan
+
+    def _candidates(self, scan):
+        """
+        Ordena las redes configuradas que están visibles de mayor a menor RSSI.
+        Con una sola red configurada se intenta aunque no aparezca (SSID oculto).
+        """
+        visibles = [net for net in self.networks if net.get('ssid') in scan]
+        visibles.sort(key=lambda net: scan[net.get('ssid')][0], reverse=True)
+        if not visibles and len(self.networks) == 1:
+            return list(self.networks)
+        return visibles
+
+    def retry_due(self):
+        """
+        Indica si ya terminó la espera exponencial y se puede intentar conectar.
+
+        Returns:
+            bool: True si `connect` hará un intento real.
+        """
+        return time.ticks_diff(time.ticks_ms(), self._next_attempt) >= 0
+
+    async def _try_network(self, ssid, pwd, bssid=None, channel=None):
+        """
+        Conecta a una red y espera el resultado sin bloquear el bucle de eventos.
+
+        Args:
+            ssid (str): Nombre de la red.
+            pwd (str): Contraseña.
+            bssid (str, optional): BSSID en hex para ir directo a un AP concreto.
+            channel (int, optional): Canal del AP, para no recorrer todos.
+
+        Returns:
+            bool: True si se obtuvo conexión.
+        """
+        self.state = self.CONECTANDO
+        if bssid:
+            try:
+                self.wlan.connect(ssid, pwd, bssid=ubinascii.unhexlify(bssid),
+                                  channel=channel)
+            except TypeError:
+                # Puertos sin el argumento `channel`
+                self.wlan.connect(ssid, pwd, bssid=ubinascii.unhexlify(bssid))
+        else:
+            self.wlan.connect(ssid, pwd)
+        inicio = time.ticks_ms()
+        while time.ticks_diff(time.ticks_ms(), inicio) < self.CONNECT_TIMEOUT_MS:
+            if self.wlan.isconnected():
+                return True
+            # Estados negativos (clave incorrecta, red no encontrada, fallo):
+            # no tiene sentido esperar el tiempo completo
+            if self.wlan.status() < 0:
+                break
+            await asyncio.sleep_ms(self.POLL_MS)
+        self.wlan.disconnect()
+        return False
+
+    async def _connect_last_ap(self):
+        """
+        Intenta la reconexión rápida al último AP guardado, si sigue configurado.
+
+        Returns:
+            bool: True si se conectó.
+        """
+        last = self._load_last_ap()
+        ssid = last.get('ssid')
+        for net in self.networks:
+            if ssid and net.get('ssid') == ssid:
+                return await self._try_network(ssid, net.get('password'),
+                                               last.get('bssid'), last.get('channel'))
+        return False
+
+    async def connect(self, config_path="/wifi_config.json", retry_interval=5):
         """
         Intenta conectarse a las redes especificadas en el archivo de configuración.
 
+        Primero prueba el último AP que funcionó, directamente por BSSID y
+        canal. Si falla, escanea y prueba las redes visibles en orden de RSSI.
+        Si ninguna conecta, el siguiente intento se pospone `retry_interval`
+        segundos, duplicando la espera en cada fallo hasta `MAX_BACKOFF_S`;
+        mientras tanto la llamada vuelve de inmediato.
+
         Args:
             config_path (str): Ruta del archivo de configuración Wi-Fi.
-            retry_interval (int): Intervalo de reintento en segundos.
+            retry_interval (int): Espera inicial entre intentos fallidos, en segundos.
 
         Returns:
-            bool: True si se conecta correctamente, False si falla.
+            bool: True si se conecta correctamente, False si falla o aún está
+            en espera.
         """
+        if self.wlan.isconnected():
+            self.state = self.CONECTADO
+            return True
+        if not self.retry_due():
+            return False
         self.retry_interval = retry_interval
         self.config = self._load_config(config_path)
         self.static = self.config.get('static')
@@ -70,28 +265,32 @@ class WiFiManager:
         
         if not self.wlan.active():
             self.wlan.active(True)
-        try:
-            scan = [ssid.decode() for ssid, *_ in self.wlan.scan()]
-        except Exception:
-            scan = []
-        for net in self.networks:
-            ssid, pwd = net.get('ssid'), net.get('password')
-            if ssid in scan or len(self.networks) == 1:
-                self.wlan.connect(ssid, pwd)
-                start = time.time()
-                while time.time() - start < 15:
-                    if self.wlan.isconnected(): break
-                    time.sleep(1)
-                if self.wlan.isconnected() and self.static:
-                    try:
-                        self.wlan.ifconfig((
-                            self.static['ip'], self.static['subnet'],
-                            self.static['gateway'], self.static['dns']
-                        ))
-                    except:
-                        pass
-                break
+        if not await self._connect_last_ap():
+            scan = self._scan_networks()
+            for net in self._candidates(scan):
+                ssid = net.get('ssid')
+                if await self._try_network(ssid, net.get('password')):
+                    _, bssid, channel = scan.get(ssid, (None, None, None))
+                    self._save_last_ap(ssid, bssid, channel)
+                    break
+        if self.wlan.isconnected() and self.static:
+            try:
+                self.wlan.ifconfig((
+                    self.static['ip'], self.static['subnet'],
+                    self.static['gateway'], self.static['dns']
+                ))
+            except:
+                pass
         self._was_connected = self.wlan.isconnected()
+        if self._was_connected:
+            self.state = self.CONECTADO
+            self._backoff_s = 0
+        else:
+            self.state = self.ESPERA
+            self._backoff_s = min(self._backoff_s * 2 or retry_interval, self.MAX_BACKOFF_S)
+            self._next_attempt = time.ticks_add(time.ticks_ms(), self._backoff_s * 1000)
+            # Las redes pudieron cambiar: el próximo intento vuelve a escanear
+            self._scan = None
         return self._was_connected
 
     def is_connected(self):
@@ -113,6 +312,8 @@ class WiFiManager:
         now = self.wlan.isconnected()
         lost = self._was_connected and not now
         self._was_connected = now
+        if lost:
+            self.state = self.DESCONECTADO
         return lost
 
     def get_ip(self):
@@ -125,37 +326,450 @@ class WiFiManager:
         if self.wlan.isconnected(): return self.wlan.ifconfig()[0]
         return None
 
+# Códigos de operación de las tramas WebSocket (RFC 6455, sección 5.2)
+OP_CONTINUACION = 0x0
+OP_TEXTO = 0x1
+OP_BINARIO = 0x2
+OP_CIERRE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+def encabezado_trama(opcode, longitud):
+    """
+    Construye el encabezado de una trama del servidor (final y sin máscara).
+
+    Args:
+        opcode (int): Código de operación.
+        longitud (int): Longitud de la carga útil.
+
+    Returns:
+        bytearray: Encabezado de 2, 4 o 10 bytes.
+    """
+    header = bytearray([0x80 | opcode])
+    if longitud < 126:
+        header.append(longitud)
+    elif longitud < (1 << 16):
+        header.extend([126]); header.extend(longitud.to_bytes(2,'big'))
+    else:
+        header.extend([127]); header.extend(longitud.to_bytes(8,'big'))
+    return header
+
+def trama(opcode, payload):
+    """
+    Construye una trama completa del servidor, lista para escribirse tal cual
+    en uno o varios clientes.
+
+    Args:
+        opcode (int): Código de operación.
+        payload (bytes): Carga útil.
+
+    Returns:
+        bytearray: Encabezado seguido de la carga útil.
+    """
+    datos = encabezado_trama(opcode, len(payload))
+    datos.extend(payload)
+    return datos
+
+# Segundos a sumar a un epoch del dispositivo para obtener tiempo Unix
+AJUSTE_UNIX = formato_bin.EPOCH_UNIX.get(time.gmtime(0)[0], 0)
+
+def registro_json(t, temp, pres, hum):
+    """
+    Convierte un registro de la SD en la entrada de historial que espera la App.
+
+    Args:
+        t (int): Marca de tiempo del dispositivo.
+        temp (int): Temperatura en centésimas de °C.
+        pres (int): Presión en Pa.
+        hum (int): Humedad en centésimas de %.
+
+    Returns:
+        dict: {"t", "hora", "temperatura", "presion", "humedad"}, con `t` en
+        tiempo Unix y los valores en °C, hPa y %.
+    """
+    lt = time.localtime(t)
+    return {
+        "t": t + AJUSTE_UNIX,
+        "hora": "{:02d}:{:02d}:{:02d}".format(lt[3], lt[4], lt[5]),
+        "temperatura": temp / 100,
+        "presion": pres / 100,
+        "humedad": hum / 100
+    }
+
+def mensaje_json(mensaje):
+    """
+    Convierte la última lectura en el mensaje en tiempo real que espera la App.
+
+    Args:
+        mensaje (dict): {"temperatura", "humedad", "presion", "condicion"} con
+            las lecturas enteras (centésimas de °C y de %, Pa).
+
+    Returns:
+        dict: Las mismas claves con los valores en °C, % y hPa.
+    """
+    return {
+        "temperatura": mensaje["temperatura"] / 100,
+        "humedad": mensaje["humedad"] / 100,
+        "presion": mensaje["presion"] / 100,
+        "condicion": mensaje["condicion"]
+    }
+
+class DecodificadorWS:
+    """
+    Decodificador incremental de tramas WebSocket enviadas por un cliente.
+
+    Se alimenta con los bytes tal como llegan del socket (`alimentar`) y
+    entrega los mensajes completos (`siguiente`): quita la máscara, reúne los
+    mensajes fragmentados en tramas de continuación y entrega las tramas de
+    control (ping, pong, cierre) en cuanto llegan, aunque estén intercaladas
+    entre fragmentos.
+
+    Los errores de protocolo se señalan con `ValueError(codigo, motivo)`,
+    donde `codigo` es el código de cierre que debe enviarse al cliente.
+    """
+
+    def __init__(self, max_mensaje=4096):
+        """
+        Args:
+            max_mensaje (int): Tamaño máximo de un mensaje, en bytes.
+        """
+        self.max_mensaje = max_mensaje
+        self._buf = bytearray()
+        # Mensaje fragmentado en curso: código de operación y datos acumulados
+        self._op_fragmentado = None
+        self._fragmentos = None
+
+    def alimentar(self, datos):
+        """
+        Agrega bytes recibidos del cliente.
+        """
+        self._buf.extend(datos)
+
+    def siguiente(self):
+        """
+        Devuelve el siguiente mensaje completo, si lo hay.
+
+        Returns:
+            tuple or None: (opcode, carga útil en bytes), o None si faltan datos.
+
+        Raises:
+            ValueError: (código de cierre, motivo) si el cliente viola el protocolo.
+        """
+        while True:
+            trama = self._extraer_trama()
+            if trama is None:
+                return None
+            fin, opcode, payload = trama
+            if opcode >= OP_CIERRE:
+                if not fin or len(payload) > 125:
+                    raise ValueError(1002, 'trama de control inválida')
+                if opcode not in (OP_CIERRE, OP_PING, OP_PONG):
+                    raise ValueError(1002, 'opcode desconocido')
+                return opcode, payload
+            if opcode == OP_CONTINUACION:
+                if self._fragmentos is None:
+                    raise ValueError(1002, 'continuación sin mensaje inicial')
+                if len(self._fragmentos) + len(payload) > self.max_mensaje:
+                    raise ValueError(1009, 'mensaje demasiado grande')
+                self._fragmentos.extend(payload)
+                if fin:
+                    opcode, payload = self._op_fragmentado, bytes(self._fragmentos)
+                    self._op_fragmentado = self._fragmentos = None
+                    return opcode, payload
+                continue
+            if opcode not in (OP_TEXTO, OP_BINARIO):
+                raise ValueError(1002, 'opcode desconocido')
+            if self._fragmentos is not None:
+                raise ValueError(1002, 'mensaje nuevo antes de terminar el fragmentado')
+            if fin:
+                return opcode, payload
+            self._op_fragmentado = opcode
+            self._fragmentos = bytearray(payload)
+
+    def _extraer_trama(self):
+        """
+        Extrae una trama completa del búfer y le quita la máscara.
+
+        Returns:
+            tuple or None: (fin, opcode, carga útil), o None si la trama está incompleta.
+        """
+        buf = self._buf
+        if len(buf) < 2:
+            return None
+        b0, b1 = buf[0], buf[1]
+        if b0 & 0x70:
+            raise ValueError(1002, 'bits RSV sin extensión negociada')
+        if not b1 & 0x80:
+            raise ValueError(1002, 'trama de cliente sin máscara')
+        n = b1 & 0x7F
+        pos = 2
+        if n == 126:
+            if len(buf) < 4:
+                return None
+            n = int.from_bytes(buf[2:4], 'big')
+            pos = 4
+        elif n == 127:
+            if len(buf) < 10:
+                return None
+            n = int.from_bytes(buf[2:10], 'big')
+            pos = 10
+        if n > self.max_mensaje:
+            raise ValueError(1009, 'mensaje demasiado grande')
+        if len(buf) < pos + 4 + n:
+            return None
+        mascara = buf[pos:pos + 4]
+        pos += 4
+        payload = buf[pos:pos + n]
+        for i in range(n):
+            payload[i] ^= mascara[i & 3]
+        self._buf = buf[pos + n:]
+        return bool(b0 & 0x80), b0 & 0x0F, bytes(payload)
+
+# Canales de una suscripción, en el orden en que se envían
+CANALES = ('temperatura', 'humedad', 'presion', 'condicion')
+
+class Suscripcion:
+    """
+    Preferencias de envío de un cliente suscrito a las muestras en vivo.
+
+    Una muestra se envía si pasó `intervalo_ms` desde el envío anterior y al
+    menos un canal cambió respecto de lo último enviado: la condición con
+    cualquier cambio y las magnitudes con un cambio de al menos su banda muerta.
+
+    Atributos:
+        canales (tuple): Canales pedidos, en el orden de `CANALES`.
+        intervalo_ms (int): Tiempo mínimo entre envíos.
+        banda (dict): Cambio mínimo por canal, en centésimas de su unidad.
+    """
+
+    def __init__(self, canales=None, max_hz=1, banda=None):
+        """
+        Args:
+            canales (list, optional): Canales pedidos; por defecto, todos.
+            max_hz (float): Frecuencia máxima de envío (0 = sin límite).
+            banda (dict, optional): Banda muerta por canal en °C, % o hPa,
+                por ejemplo {"temperatura": 0.05}.
+
+        Raises:
+            ValueError: Si no se pide ningún canal válido.
+        """
+        canales = canales or CANALES
+        self.canales = tuple(c for c in CANALES if c in canales)
+        if not self.canales:
+            raise ValueError('Suscripción sin canales válidos')
+        self.intervalo_ms = int(1000 / max_hz) if max_hz and max_hz > 0 else 0
+        self.banda = {}
+        for canal, valor in (banda or {}).items():
+            if canal in CANALES and canal != 'condicion':
+                self.banda[canal] = int(float(valor) * 100 + 0.5)
+        self._enviado = None
+        self._ultimo_envio = None
+
+    def debe_enviar(self, valores):
+        """
+        Decide si una muestra se envía y, si es así, la registra como enviada.
+
+        Args:
+            valores (dict): Valor de cada canal (centésimas o condición).
+
+        Returns:
+            bool: True si la muestra debe enviarse.
+        """
+        if self._ultimo_envio is not None and \
+                time.ticks_diff(time.ticks_ms(), self._ultimo_envio) < self.intervalo_ms:
+            return False
+        if self._enviado is not None:
+            for canal in self.canales:
+                anterior, actual = self._enviado[canal], valores[canal]
+                if actual != anterior and (canal == 'condicion' or
+                                           abs(actual - anterior) >= self.banda.get(canal, 0)):
+                    break
+            else:
+                return False
+        self._enviado = valores
+        self._ultimo_envio = time.ticks_ms()
+        return True
+
+class ColaEnvio:
+    """
+    Cola de salida de un cliente WebSocket, vaciada por su propia tarea de escritura.
+
+    Las tramas de control y del historial se envían todas y en orden, hasta
+    `maximo` pendientes; quien encola una más cuando está llena espera a que
+    haya sitio. De los datos en vivo solo se guarda el más reciente: si el
+    cliente va atrasado, una muestra nueva reemplaza a la que aún no salió.
+
+    Atributos:
+        tramas (list): Tramas pendientes que no se pueden descartar.
+        vivo (bytes): Última trama de datos en vivo pendiente, o None.
+        descartadas (int): Tramas en vivo reemplazadas antes de enviarse.
+        tarea (Task): Tarea que escribe las tramas en el cliente.
+    """
+
+    def __init__(self, maximo):
+        """
+        Args:
+            maximo (int): Máximo de tramas pendientes sin contar la de datos en vivo.
+        """
+        self.maximo = maximo
+        self.tramas = []
+        self.vivo = None
+        self.descartadas = 0
+        self.tarea = None
+        self.cerrada = False
+        self.hay_datos = asyncio.Event()
+        self.hay_espacio = asyncio.Event()
+        self.hay_espacio.set()
+        self.vacia = asyncio.Event()
+        self.vacia.set()
+
+    def profundidad(self):
+        """
+        Devuelve el número de tramas pendientes de enviar.
+        """
+        return len(self.tramas) + (self.vivo is not None)
+
+    def poner_vivo(self, datos):
+        """
+        Deja `datos` como la trama en vivo pendiente, reemplazando la anterior.
+        """
+        if self.cerrada:
+            return
+        if self.vivo is not None:
+            self.descartadas += 1
+        self.vivo = datos
+        self._avisar()
+
+    def poner(self, datos):
+        """
+        Encola una trama si hay sitio.
+
+        Returns:
+            bool: False si la cola está llena.
+        """
+        if self.cerrada:
+            return True
+        if len(self.tramas) >= self.maximo:
+            return False
+        self.tramas.append(datos)
+        if len(self.tramas) >= self.maximo:
+            self.hay_espacio.clear()
+        self._avisar()
+        return True
+
+    async def poner_esperando(self, datos):
+        """
+        Encola una trama, esperando a que haya sitio si la cola está llena.
+        """
+        while not self.poner(datos):
+            await self.hay_espacio.wait()
+
+    def sacar(self):
+        """
+        Devuelve la siguiente trama a enviar: primero las encoladas y después
+        la de datos en vivo.
+
+        Returns:
+            bytes: Trama, o None si no hay ninguna pendiente.
+        """
+        if self.tramas:
+            datos = self.tramas.pop(0)
+            self.hay_espacio.set()
+            return datos
+        datos = self.vivo
+        self.vivo = None
+        return datos
+
+    def cerrar(self):
+        """
+        Descarta lo pendiente y libera a quien espera sitio o vaciado.
+        """
+        self.cerrada = True
+        self.tramas = []
+        self.vivo = None
+        self.hay_espacio.set()
+        self.vacia.set()
+
+    def _avisar(self):
+        self.vacia.clear()
+        self.hay_datos.set()
+
 class WebSocketServer:
     """
     Servidor WebSocket para envío de datos en tiempo real o historial desde almacenamiento SD.
 
     Permite conexiones WebSocket y transmite datos a múltiples clientes,
-    distinguiendo entre conexiones de tipo 'real' (tiempo real) e 'historial'.
+    distinguiendo entre conexiones de tipo 'real' (tiempo real), 'historial'
+    y 'suscrito'. Las solicitudes y los formatos de respuesta se describen en
+    `protocolo_bin`.
+
+    Cada cliente tiene una `ColaEnvio` acotada que vacía su propia tarea de
+    escritura, y todas las esperas tienen un tiempo máximo, así que un cliente
+    lento o colgado solo se retrasa o se desconecta a sí mismo. Las respuestas
+    del historial ya codificadas se guardan en una caché LRU por consulta.
     """
     GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+    # Tiempos máximos por cliente (ms)
+    HANDSHAKE_TIMEOUT_MS = 5000
+    SEND_TIMEOUT_MS = 3000
+    PING_INTERVAL_MS = 20000
+    # Tramas pendientes por cliente, sin contar la última muestra en vivo
+    COLA_MAX = 4
+    # Registros por bloque y por respuesta del historial por intervalo
+    HISTORIAL_BLOQUE = 50
+    HISTORIAL_BLOQUE_DELTA = 200
+    HISTORIAL_LIMITE = 500
+    # Límites de la caché de respuestas del historial
+    CACHE_ENTRADAS = 8
+    CACHE_BYTES = 16384
 
-    def __init__(self, sd_logger, port=8765):
+    def __init__(self, sd_logger, port=8765, historial=None):
         """
         Inicializa el servidor WebSocket.
 
         Args:
             sd_logger: Objeto con funcionalidad para leer desde almacenamiento SD.
             port (int): Puerto en el que el servidor escucha.
+            historial (HistorialRAM, optional): Muestras recientes en RAM; las
+                consultas que cubre por completo se responden sin leer la SD.
         """
         self.sd_logger = sd_logger
+        self.historial = historial
         self.port = port
         self.running = False
         self.server_task = None
+        self.server = None
+        # StreamWriter de cada cliente -> tipo de conexión
         self.connections = {}
+        # StreamWriter -> Suscripcion de los clientes de tipo 'suscrito'
+        self.suscripciones = {}
+        # StreamWriter -> clave del último historial enviado
+        self._historial_enviado = {}
+        # StreamWriter de los clientes que negociaron el formato binario
+        self._binarios = set()
+        # StreamWriter -> ColaEnvio del cliente
+        self._colas = {}
+        # Tramas en vivo descartadas de clientes ya desconectados
+        self._descartadas = 0
         self.flags = {'enviando': False, 'conectado': False, 'guardando': False}
         self.ultimo_mensaje = None
+        # Tramas del último dato ya codificadas: (mensaje, {binario: trama})
+        self._real_cache = (None, {})
+        # Caché LRU del historial: clave de consulta -> (lista de tramas, si
+        # los registros nuevos la invalidan), con las claves de la menos a la
+        # más usada y la versión de la SD
+        self._cache = {}
+        self._cache_orden = []
+        self._cache_bytes = 0
+        self._cache_version = None
 
     def start(self, ultimo_mensaje=None):
         """
         Inicia el servidor WebSocket de forma asíncrona.
 
         Args:
-            ultimo_mensaje (dict, optional): Último mensaje para enviar a nuevas conexiones.
+            ultimo_mensaje (dict, optional): Última lectura para enviar a nuevas
+                conexiones, en enteros (ver `mensaje_json`).
         """
         if not self.running:
             self.ultimo_mensaje = ultimo_mensaje
@@ -169,140 +783,640 @@ class WebSocketServer:
         """
         if self.running:
             self.running = False
-            for conn in list(self.connections):
-                try: conn.close()
-                except: pass
+            for writer in list(self.connections):
+                self._drop(writer)
             self.connections.clear()
+            self.suscripciones.clear()
+            self._historial_enviado.clear()
+            self._binarios.clear()
+            if self.server:
+                self.server.close()
+                self.server = None
             if self.server_task: self.server_task.cancel()
             self.flags['conectado'] = False
 
     async def _serve(self):
         """
-        Bucle principal del servidor para aceptar y manejar conexiones entrantes.
+        Abre el socket de escucha; `asyncio` acepta las conexiones y lanza
+        `_handle_client` para cada una en cuanto llegan.
         """
-        addr = socket.getaddrinfo('0.0.0.0', self.port)[0][-1]
-        sock = socket.socket()
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(addr)
-        sock.listen(5)
-        sock.setblocking(False)
-        while self.running:
-            try:
-                conn, _ = sock.accept()
-                conn.setblocking(True)
-                asyncio.create_task(self._handle_client(conn))
-            except OSError:
-                await asyncio.sleep(0.1)
-        sock.close()
+        try:
+            self.server = await asyncio.start_server(
+                self._handle_client, '0.0.0.0', self.port, backlog=5)
+        except Exception as e:
+            print("❌ Error iniciando servidor WebSocket:", e)
+            self.running = False
+            self.flags['conectado'] = False
 
-    async def _handle_client(self, conn):
+    async def _handshake(self, reader, writer):
         """
-        Maneja el proceso de handshake y comunicación con un cliente WebSocket.
+        Lee la petición HTTP de upgrade y responde el handshake WebSocket.
+        Si el cliente ofrece el subprotocolo binario, se acepta y el cliente
+        queda en `_binarios`.
 
         Args:
-            conn (socket): Conexión del cliente.
-        """
-        data = conn.recv(1024)
-        if b"Upgrade: websocket" not in data:
-            conn.close(); return
-        key = next((line.split(': ')[1] for line in data.decode().split('\r\n') if line.startswith('Sec-WebSocket-Key:')), None)
-        if not key:
-            conn.close(); return
+            reader (StreamReader): Flujo de entrada del cliente.
+            writer (StreamWriter): Flujo de salida del cliente.
+
+        Returns:
+            bool: True si el handshake se completó.
+        """
+        upgrade = False
+        key = None
+        binario = False
+        while True:
+            line = await reader.readline()
+            if not line or line == b'\r\n':
+                break
+            line = line.decode().strip()
+            nombre, _, valor = line.partition(':')
+            nombre = nombre.strip().lower()
+            if nombre == 'upgrade' and valor.strip().lower() == 'websocket':
+                upgrade = True
+            elif nombre == 'sec-websocket-key':
+                key = valor.strip()
+            elif nombre == 'sec-websocket-protocol':
+                ofrecidos = [p.strip() for p in valor.split(',')]
+                binario = protocolo_bin.SUBPROTOCOLO in ofrecidos
+        if not upgrade or not key:
+            return False
         accept = ubinascii.b2a_base64(hashlib.sha1((key + self.GUID).encode()).digest()).decode().strip()
-        conn.send((
+        protocolo = ''
+        if binario:
+            protocolo = f'Sec-WebSocket-Protocol: {protocolo_bin.SUBPROTOCOLO}\r\n'
+            self._binarios.add(writer)
+        writer.write((
             'HTTP/1.1 101 Switching Protocols\r\n'
             'Upgrade: websocket\r\n'
             'Connection: Upgrade\r\n'
+            f'{protocolo}'
             f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
         ).encode())
+        await writer.drain()
+        return True
+
+    async def _handle_client(self, reader, writer):
+        """
+        Maneja el proceso de handshake y comunicación con un cliente WebSocket.
 
-        # Tipo de conexión
-        inicial = conn.recv(256)
-        tipo = 'real'
+        Args:
+            reader (StreamReader): Flujo de entrada del cliente.
+            writer (StreamWriter): Flujo de salida del cliente.
+        """
         try:
-            req = json.loads(inicial.decode())
-            if req.get('solicitud') == 'historial': tipo = 'historial'
-        except:
+            if not await asyncio.wait_for_ms(self._handshake(reader, writer),
+                                             self.HANDSHAKE_TIMEOUT_MS):
+                return
+
+            cola = ColaEnvio(self.COLA_MAX)
+            cola.tarea = asyncio.create_task(self._escritor(writer, cola))
+            self._colas[writer] = cola
+            # Toda conexión empieza como 'real'; el cliente puede pedir el historial después
+            self.connections[writer] = 'real'
+            if self.ultimo_mensaje:
+                await self._write(writer, self._trama_real(writer in self._binarios), vivo=True)
+
+            decodificador = DecodificadorWS()
+            ping_pendiente = False
+            while self.running and writer in self.connections:
+                try:
+                    datos = await asyncio.wait_for_ms(reader.read(512), self.PING_INTERVAL_MS)
+                except asyncio.TimeoutError:
+                    # Dos intervalos sin recibir nada, ni siquiera el pong: conexión muerta
+                    if ping_pendiente:
+                        break
+                    await self._send_frame(writer, OP_PING, b'')
+                    ping_pendiente = True
+                    continue
+                # La lectura devuelve b'' cuando el cliente cierra la conexión
+                if not datos:
+                    break
+                ping_pendiente = False
+                decodificador.alimentar(datos)
+                while True:
+                    mensaje = decodificador.siguiente()
+                    if mensaje is None:
+                        break
+                    opcode, payload = mensaje
+                    if opcode == OP_PING:
+                        await self._send_frame(writer, OP_PONG, payload)
+                    elif opcode == OP_CIERRE:
+                        # Se confirma el cierre con el mismo código de estado
+                        await self._send_frame(writer, OP_CIERRE, payload[:2])
+                        await self._vaciar(writer)
+                        return
+                    elif opcode == OP_TEXTO:
+                        await self._atender_solicitud(writer, payload)
+        except ValueError as e:
+            # Error de protocolo: se cierra con el código correspondiente
+            codigo = e.args[0] if e.args and isinstance(e.args[0], int) else 1011
+            await self._send_frame(writer, OP_CIERRE, codigo.to_bytes(2, 'big'))
+            await self._vaciar(writer)
+        except Exception:
             pass
-        self.connections[conn] = tipo
+        finally:
+            self._drop(writer)
 
-        # Envío inicial según tipo
-        if tipo == 'real' and self.ultimo_mensaje:
-            await self._send(conn, json.dumps(self.ultimo_mensaje))
-        elif tipo == 'historial':
-            historial = self._leer_historial_completo(10)
-            await self._send(conn, json.dumps({'historial': historial}))
+    async def _atender_solicitud(self, writer, payload):
+        """
+        Procesa un mensaje de texto del cliente y cambia su tipo de conexión.
 
+        Args:
+            writer (StreamWriter): Flujo de salida del cliente.
+            payload (bytes): Mensaje JSON, por ejemplo {"solicitud": "historial"}.
+        """
         try:
-            while self.running:
-                await asyncio.sleep(0.1)
-        finally:
-            conn.close()
-            self.connections.pop(conn, None)
+            req = json.loads(payload.decode())
+            solicitud = req.get('solicitud')
+        except Exception:
+            return
+        if solicitud == 'suscribir':
+            try:
+                suscripcion = Suscripcion(req.get('canales'), req.get('max_hz', 1),
+                                          req.get('banda'))
+            except (ValueError, TypeError, AttributeError):
+                return
+            self.connections[writer] = 'suscrito'
+            self.suscripciones[writer] = suscripcion
+            return
+        self.suscripciones.pop(writer, None)
+        if solicitud == 'historial' and ('desde' in req or 'hasta' in req or 'cursor' in req):
+            # Consulta puntual: el cliente no recibe envíos periódicos mientras tanto
+            self.connections[writer] = 'consulta'
+            try:
+                await self._enviar_rango(writer, req)
+            except (ValueError, TypeError):
+                pass
+        elif solicitud == 'historial':
+            self.connections[writer] = 'historial'
+            datos = self._trama_historial(10, writer in self._binarios)
+            self._historial_enviado[writer] = self._version_sd()
+            await self._write(writer, datos)
+        elif solicitud == 'real':
+            self.connections[writer] = 'real'
+            if self.ultimo_mensaje:
+                await self._write(writer, self._trama_real(writer in self._binarios), vivo=True)
+
+    async def _enviar_rango(self, writer, req):
+        """
+        Responde una consulta de historial por intervalo en bloques acotados.
+
+        Cada bloque se lee (del historial en RAM si cubre la ventana, si no de
+        la SD), se codifica y se envía antes de leer el siguiente, así que la
+        memoria usada no depende del tamaño del rango.
+
+        Args:
+            writer (StreamWriter): Flujo de salida del cliente.
+            req (dict): Solicitud con `desde`, `hasta`, `resolucion`, `limite`,
+                `cursor` y `delta`.
+
+        Raises:
+            ValueError, TypeError: Si algún parámetro no es numérico.
+        """
+        binario = writer in self._binarios
+        # Los deltas solo existen en el formato binario
+        delta = binario and bool(req.get('delta'))
+        bloque = self.HISTORIAL_BLOQUE_DELTA if delta else self.HISTORIAL_BLOQUE
+        hasta = int(req['hasta']) - AJUSTE_UNIX if req.get('hasta') is not None else time.time()
+        desde = int(req['desde']) - AJUSTE_UNIX if req.get('desde') is not None else hasta - 86400
+        # Registros con epoch `desde` que ya recibió el cliente
+        saltar = 0
+        if req.get('cursor') is not None:
+            cursor = req['cursor']
+            t, n = cursor if isinstance(cursor, list) else (cursor, 0)
+            t = int(t) - AJUSTE_UNIX
+            if t >= desde:
+                desde, saltar = t, max(0, int(n))
+        try:
+            limite = int(req.get('limite') or self.HISTORIAL_LIMITE)
+        except (ValueError, TypeError):
+            limite = self.HISTORIAL_LIMITE
+        limite = max(1, min(limite, self.HISTORIAL_LIMITE))
+        resolucion = req.get('resolucion')
+        if resolucion not in (0, resumenes.MINUTO, resumenes.HORA):
+            resolucion = None
+        en_ram = resolucion in (None, 0) and self._en_ram(desde)
+        if not en_ram and not self.sd_logger.sd_montada:
+            await self._write(writer, self._trama_bloque(None, 0, None, False, binario, delta))
+            return
+        clave = (desde, saltar, hasta, resolucion, limite, binario, delta)
+        # Sin `hasta` la ventana llega hasta ahora y no se repite
+        guardadas = self._cache_leer(clave) if req.get('hasta') is not None else None
+        if guardadas is not None:
+            for datos in guardadas:
+                await self._write(writer, datos)
+            return
+        version = self._version_sd()
+        if en_ram:
+            resolucion = 0
+        elif resolucion is None:
+            resolucion = self.sd_logger.elegir_resolucion(desde, hasta)
+        # Una ventana que termina antes del registro más reciente ya no cambia
+        # con los registros nuevos
+        ultimo = self._ultimo_t(resolucion)
+        abierta = ultimo is None or hasta >= ultimo
+        # Las tramas se guardan mientras la respuesta quepa en la caché
+        tramas = [] if req.get('hasta') is not None else None
+        tam = 0
+        enviados = 0
+        while writer in self.connections:
+            n = min(bloque, limite - enviados)
+            # Se pide un registro de más para saber si quedan otros después
+            if en_ram:
+                registros = self._leer_ram(desde, hasta, saltar + n + 1)
+            else:
+                registros = self.sd_logger.query(desde, hasta, saltar + n + 1, resolucion)
+            del registros[:saltar]
+            cursor = None
+            if len(registros) > n:
+                # El siguiente registro y cuántos con su mismo epoch ya van
+                # enviados, para no repetirlos si varios comparten el epoch
+                t = registros[n][0]
+                iguales = 0
+                while iguales < n and registros[n - 1 - iguales][0] == t:
+                    iguales += 1
+                if iguales == n and t == desde:
+                    iguales += saltar
+                cursor = (t, iguales)
+            del registros[n:]
+            enviados += len(registros)
+            # Sin cursor no quedan registros; con cursor y el límite alcanzado,
+            # la respuesta termina truncada y el cliente pide la página siguiente
+            truncado = cursor is not None and enviados >= limite
+            datos = self._trama_bloque(registros, resolucion, cursor, truncado, binario, delta)
+            if tramas is not None:
+                tam += len(datos)
+                if tam <= self.CACHE_BYTES:
+                    tramas.append(datos)
+                else:
+                    tramas = None
+            await self._write(writer, datos)
+            if cursor is None or truncado:
+                if tramas is not None:
+                    self._cache_guardar(clave, tramas, version, abierta)
+                return
+            desde, saltar = cursor
+
+    def _trama_bloque(self, registros, resolucion, cursor, truncado, binario, delta=False):
+        """
+        Codifica un bloque de la respuesta del historial.
+
+        Args:
+            registros (list): Tuplas (t, temperatura, presion, humedad), o
+                None si la SD no está disponible.
+            resolucion (int): 0 o el periodo del resumen en segundos.
+            cursor (tuple): (epoch del dispositivo del siguiente registro,
+                registros con ese epoch ya enviados), o None si no quedan más
+                (fin del intervalo).
+            truncado (bool): Si la respuesta termina aquí por el límite aunque
+                queden registros.
+            binario (bool): Si es True, en el formato de `protocolo_bin`.
+            delta (bool): Si es True, con diferencias en varint.
+        """
+        if binario:
+            return trama(OP_BINARIO, protocolo_bin.empaquetar_historial(
+                registros, time.gmtime(0)[0], resolucion, cursor, cursor is None,
+                delta, truncado))
+        mensaje = {
+            'historial': 'no disponible' if registros is None else [registro_json(*r) for r in registros],
+            'resolucion': resolucion,
+            'cursor': None if cursor is None else [cursor[0] + AJUSTE_UNIX, cursor[1]],
+            'fin': cursor is None,
+            'truncado': truncado
+        }
+        return trama(OP_TEXTO, json.dumps(mensaje).encode())
+
+    def _drop(self, writer):
+        """
+        Cierra la conexión de un cliente, detiene su tarea de escritura y lo
+        quita de la lista.
+        """
+        cola = self._colas.pop(writer, None)
+        if cola is not None:
+            self._descartadas += cola.descartadas
+            cola.cerrar()
+            if cola.tarea is not None and cola.tarea is not asyncio.current_task():
+                cola.tarea.cancel()
+        self.connections.pop(writer, None)
+        self.suscripciones.pop(writer, None)
+        self._historial_enviado.pop(writer, None)
+        self._binarios.discard(writer)
+        try:
+            writer.close()
+        except:
+            pass
 
     async def handle_sending(self, data=None, send_history=False, history_count=10):
         """
         Envía datos a clientes conectados según el tipo de conexión.
 
+        Cada mensaje se codifica una sola vez por formato y la misma trama se
+        encola a todos los clientes del tipo correspondiente, sin esperar a
+        que se envíe. Si la cola de un cliente de historial está llena, el
+        historial se le envía en una llamada posterior.
+
         Args:
-            data (dict, optional): Datos en tiempo real para enviar a tipo 'real'.
-            send_history (bool): Si es True, reenvía historial a tipo 'historial'.
+            data (dict, optional): Lectura en tiempo real para enviar a tipo
+                'real', en enteros (ver `mensaje_json`).
+            send_history (bool): Si es True, reenvía historial a tipo 'historial'
+                (solo a los clientes que no tienen ya el más reciente).
             history_count (int): Cantidad de registros del historial a enviar.
         """
         self.flags['enviando'] = False
-        for conn, tipo in list(self.connections.items()):
+        if data is not None:
+            self.ultimo_mensaje = data
+        for writer, tipo in list(self.connections.items()):
             if tipo == 'real' and data is not None:
-                await self._send(conn, json.dumps(data))
+                await self._write(writer, self._trama_real(writer in self._binarios), vivo=True)
                 self.flags['enviando'] = True
             if tipo == 'historial' and send_history:
-                historial = self._leer_historial_completo(history_count)
-                await self._send(conn, json.dumps({'historial': historial}))
+                version = self._version_sd()
+                cola = self._colas.get(writer)
+                if self._historial_enviado.get(writer) != version and cola is not None:
+                    if cola.poner(self._trama_historial(history_count, writer in self._binarios)):
+                        self._historial_enviado[writer] = version
+
+    async def publicar_muestra(self, temp, hum, pres, cond):
+        """
+        Envía una lectura nueva a los clientes suscritos que deban recibirla.
+
+        Los clientes con los mismos canales y formato comparten la trama codificada.
+
+        Args:
+            temp (int): Temperatura en centésimas de °C.
+            hum (int): Humedad en centésimas de %.
+            pres (int): Presión en Pa.
+            cond (str): Condición climática.
+        """
+        if not self.suscripciones:
+            return
+        valores = {'temperatura': temp, 'humedad': hum, 'presion': pres, 'condicion': cond}
+        tramas = {}
+        for writer, suscripcion in list(self.suscripciones.items()):
+            if not suscripcion.debe_enviar(valores):
+                continue
+            binario = writer in self._binarios
+            datos = tramas.get((suscripcion.canales, binario))
+            if datos is None:
+                if binario:
+                    datos = trama(OP_BINARIO, protocolo_bin.empaquetar_muestra(
+                        temp, hum, pres, cond, suscripcion.canales))
+                else:
+                    mensaje = {}
+                    for canal in suscripcion.canales:
+                        valor = valores[canal]
+                        mensaje[canal] = valor if canal == 'condicion' else valor / 100
+                    datos = trama(OP_TEXTO, json.dumps(mensaje).encode())
+                tramas[(suscripcion.canales, binario)] = datos
+            await self._write(writer, datos, vivo=True)
+            self.flags['enviando'] = True
+
+    def _trama_real(self, binario=False):
+        """
+        Devuelve la trama de `ultimo_mensaje`, codificándola solo si cambió.
+
+        Args:
+            binario (bool): Si es True, en el formato de `protocolo_bin`.
+        """
+        mensaje, tramas = self._real_cache
+        if mensaje is not self.ultimo_mensaje:
+            tramas = {}
+            self._real_cache = (self.ultimo_mensaje, tramas)
+        datos = tramas.get(binario)
+        if datos is None:
+            m = self.ultimo_mensaje
+            if binario:
+                datos = trama(OP_BINARIO, protocolo_bin.empaquetar_muestra(
+                    m['temperatura'], m['humedad'], m['presion'], m['condicion']))
+            else:
+                datos = trama(OP_TEXTO, json.dumps(mensaje_json(m)).encode())
+            tramas[binario] = datos
+        return datos
+
+    def _version_sd(self):
+        """
+        Devuelve un valor que cambia cuando cambian los datos legibles de la SD
+        o del historial en RAM. Sus dos primeros elementos solo cambian cuando
+        se borran datos o se monta o desmonta la SD.
+        """
+        ultimo = self.historial.ultimo() if self.historial is not None else None
+        return (self.sd_logger.borrados, self.sd_logger.sd_montada,
+                self.sd_logger.generacion, ultimo[0] if ultimo else None)
+
+    def _ultimo_t(self, resolucion):
+        """
+        Devuelve el epoch del registro más reciente del nivel `resolucion`
+        (en RAM o en la SD), o None si no se conoce.
+        """
+        t = self.sd_logger.ultimo_registro.get(resolucion)
+        if resolucion == 0 and self.historial is not None and len(self.historial) > 0:
+            ram = self.historial.ultimo()[0]
+            t = ram if t is None else max(t, ram)
+        return t
+
+    def _en_ram(self, desde):
+        """
+        Indica si el historial en RAM tiene todas las muestras desde `desde`.
+        """
+        return (self.historial is not None and len(self.historial) > 0
+                and self.historial.registro(0)[0] <= desde)
+
+    def _leer_ram(self, desde, hasta, limite):
+        """
+        Lee hasta `limite` muestras del historial en RAM en [desde, hasta].
+
+        Returns:
+            list: Tuplas (t, temperatura, presion, humedad).
+        """
+        registros = []
+        for registro in self.historial.desde(desde, hasta):
+            registros.append(registro)
+            if len(registros) >= limite:
+                break
+        return registros
+
+    def _cache_leer(self, clave):
+        """
+        Busca una respuesta del historial en la caché y la marca como la más
+        usada. Si hay registros nuevos desde la última consulta, descarta las
+        respuestas abiertas; si se borraron datos o cambió la SD, vacía la caché.
+
+        Args:
+            clave (tuple): Parámetros de la consulta y formato de la respuesta.
+
+        Returns:
+            list: Tramas de la respuesta, o None si no está.
+        """
+        version = self._version_sd()
+        if self._cache_version is None or version[:2] != self._cache_version[:2]:
+            for vieja in list(self._cache_orden):
+                self._cache_quitar(vieja)
+        elif version != self._cache_version:
+            for vieja in list(self._cache_orden):
+                if self._cache[vieja][1]:
+                    self._cache_quitar(vieja)
+        self._cache_version = version
+        entrada = self._cache.get(clave)
+        if entrada is None:
+            return None
+        self._cache_orden.remove(clave)
+        self._cache_orden.append(clave)
+        return entrada[0]
+
+    def _cache_guardar(self, clave, tramas, version, abierta=True):
+        """
+        Guarda una respuesta del historial, descartando las menos usadas si se
+        superan `CACHE_ENTRADAS` o `CACHE_BYTES`.
+
+        Args:
+            clave (tuple): Parámetros de la consulta y formato de la respuesta.
+            tramas (list): Tramas completas de la respuesta.
+            version (tuple): `_version_sd` antes de leer los datos.
+            abierta (bool): Si los registros nuevos pueden cambiar la respuesta.
+        """
+        tam = sum(len(datos) for datos in tramas)
+        actual = self._version_sd()
+        if (tam > self.CACHE_BYTES or actual[:2] != version[:2]
+                or (abierta and actual != version)):
+            return
+        if clave in self._cache:
+            self._cache_quitar(clave)
+        while self._cache_orden and (len(self._cache_orden) >= self.CACHE_ENTRADAS
+                                     or self._cache_bytes + tam > self.CACHE_BYTES):
+            self._cache_quitar(self._cache_orden[0])
+        self._cache[clave] = (tramas, abierta)
+        self._cache_orden.append(clave)
+        self._cache_bytes += tam
+
+    def _cache_quitar(self, clave):
+        """
+        Descarta una respuesta de la caché.
+        """
+        self._cache_orden.remove(clave)
+        self._cache_bytes -= sum(len(datos) for datos in self._cache.pop(clave)[0])
+
+    def _trama_historial(self, cantidad, binario=False):
+        """
+        Devuelve la trama de los últimos registros del historial, leyendo la
+        SD solo si no está en la caché.
+
+        Args:
+            cantidad (int): Número de registros del historial.
+            binario (bool): Si es True, en el formato de `protocolo_bin`.
+        """
+        clave = ('ultimos', cantidad, binario)
+        tramas = self._cache_leer(clave)
+        if tramas is None:
+            version = self._version_sd()
+            registros = self._leer_historial_completo(cantidad)
+            if binario:
+                datos = trama(OP_BINARIO, protocolo_bin.empaquetar_historial(
+                    registros, time.gmtime(0)[0]))
+            else:
+                if registros is None:
+                    historial = 'no disponible'
+                else:
+                    historial = [registro_json(*r) for r in registros]
+                datos = trama(OP_TEXTO, json.dumps({'historial': historial}).encode())
+            tramas = [datos]
+            self._cache_guardar(clave, tramas, version)
+        return tramas[0]
 
     def _leer_historial_completo(self, cantidad):
         """
-        Lee el historial completo desde los archivos de la tarjeta SD.
+        Lee los últimos registros del historial en RAM si tiene suficientes; si
+        no, de la tarjeta SD, leyendo cada archivo desde el final sin cargarlo
+        completo en memoria.
 
         Args:
             cantidad (int): Número de registros a leer.
 
         Returns:
-            list: Lista de líneas del historial, o mensaje de error si no disponible.
+            list: Tuplas (t, temperatura, presion, humedad), o None si la SD
+            no está disponible.
         """
+        if self.historial is not None and len(self.historial) >= cantidad:
+            return list(self.historial.ultimos(cantidad))
         if not self.sd_logger.sd_montada:
-            return 'no disponible'
-        archivos = [f for f in os.listdir(self.sd_logger.mount_point)
-                    if f.startswith('lecturas_') and f.endswith('.csv')]
-        archivos.sort(reverse=True)
-        registros = []
-        for nombre in archivos:
-            with open(f"{self.sd_logger.mount_point}/{nombre}", 'r') as f:
-                lineas = f.readlines()[1:]
-                registros = lineas[-cantidad:] + registros
-                if len(registros) >= cantidad:
-                    break
-        return registros[-cantidad:]
+            return None
+        return self.sd_logger.leer_ultimos(cantidad)
+
+    async def _send_frame(self, writer, opcode, payload):
+        """
+        Envía una trama WebSocket al cliente.
+
+        Args:
+            writer (StreamWriter): Flujo de salida del cliente.
+            opcode (int): Código de operación de la trama.
+            payload (bytes): Carga útil.
+        """
+        await self._write(writer, trama(opcode, payload))
 
-    async def _send(self, conn, message):
+    async def _write(self, writer, datos, vivo=False):
         """
-        Envía un mensaje codificado en WebSocket al cliente.
+        Encola una trama ya codificada para el cliente.
 
         Args:
-            conn (socket): Conexión activa del cliente.
-            message (str): Mensaje en formato JSON.
-        """
-        payload = message.encode()
-        header = bytearray([0x81])
-        l = len(payload)
-        if l < 126:
-            header.append(l)
-        elif l < (1 << 16):
-            header.extend([126]); header.extend(l.to_bytes(2,'big'))
+            writer (StreamWriter): Flujo de salida del cliente.
+            datos (bytes): Trama completa.
+            vivo (bool): Si es True, es una muestra en vivo que reemplaza a la
+                pendiente; si no, se espera a que haya sitio en la cola.
+        """
+        cola = self._colas.get(writer)
+        if cola is None:
+            return
+        if vivo:
+            cola.poner_vivo(datos)
         else:
-            header.extend([127]); header.extend(l.to_bytes(8,'big'))
+            await cola.poner_esperando(datos)
+
+    async def _escritor(self, writer, cola):
+        """
+        Tarea de escritura de un cliente: envía las tramas de su cola.
+
+        Si el cliente no acepta una trama en `SEND_TIMEOUT_MS`, se desconecta.
+        """
         try:
-            conn.send(header + payload)
-        except:
-            conn.close(); self.connections.pop(conn, None)
+            while True:
+                datos = cola.sacar()
+                if datos is None:
+                    cola.vacia.set()
+                    cola.hay_datos.clear()
+                    await cola.hay_datos.wait()
+                    continue
+                writer.write(datos)
+                await asyncio.wait_for_ms(writer.drain(), self.SEND_TIMEOUT_MS)
+        except Exception:
+            self._drop(writer)
+
+    async def _vaciar(self, writer):
+        """
+        Espera, como máximo `SEND_TIMEOUT_MS`, a que se envíe la cola del cliente.
+        """
+        cola = self._colas.get(writer)
+        if cola is None:
+            return
+        try:
+            await asyncio.wait_for_ms(cola.vacia.wait(), self.SEND_TIMEOUT_MS)
+        except asyncio.TimeoutError:
+            pass
+
+    def estadisticas(self):
+        """
+        Devuelve el estado de las colas de envío.
+
+        Returns:
+            dict: Clientes conectados, tramas pendientes en total y en la cola
+            más llena, y tramas en vivo descartadas por clientes atrasados.
+        """
+        colas = list(self._colas.values())
+        profundidades = [cola.profundidad() for cola in colas]
+        return {
+            'clientes': len(colas),
+            'pendientes': sum(profundidades),
+            'cola_max': max(profundidades) if profundidades else 0,
+            'descartadas': self._descartadas + sum(cola.descartadas for cola in colas)
+        }
 
     def update_flags(self, sd_montada):
         """
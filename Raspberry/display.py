@@ -16,6 +16,8 @@ Contiene:
 import ssd1306
 import framebuf
 
+from unidades import formatear_centi
+
 # Definir los byte arrays para las condiciones climáticas (16x16)
 condiciones = {
     "lluvia": [
@@ -201,9 +203,9 @@ def mostrar_datos(oled, temp, hum, pres, condicion,
 
     Parámetros:
     - oled: Instancia del objeto OLED (por ejemplo, ssd1306.SSD1306_I2C).
-    - temp (float): Temperatura en grados Celsius.
-    - hum (float): Humedad relativa en porcentaje.
-    - pres (float): Presión atmosférica.
+    - temp (int): Temperatura en centésimas de grado Celsius.
+    - hum (int): Humedad relativa en centésimas de porcentaje.
+    - pres (int): Presión atmosférica en Pa.
     - condicion (str): Clave del diccionario `condiciones` para mostrar ícono climático.
     - enviando (bool): Si es True, muestra ícono de transmisión (TX).
     - conectado (bool): Si es True, muestra ícono de WiFi.
@@ -231,9 +233,9 @@ def mostrar_datos(oled, temp, hum, pres, condicion,
         draw_bitmap(oled, icono, 0, icon_h + 2, 16, 16)
         # Datos de texto
         txt_x = 20
-        oled.text(f"T:{temp:.1f}C", txt_x, icon_h + 2)
-        oled.text(f"H:{hum:.1f}%", txt_x, icon_h + 10)
-        oled.text(f"P:{pres:.1f}",  txt_x, icon_h + 18)
+        oled.text("T:{}C".format(formatear_centi(temp, 1)), txt_x, icon_h + 2)
+        oled.text("H:{}%".format(formatear_centi(hum, 1)), txt_x, icon_h + 10)
+        oled.text("P:{}".format(formatear_centi(pres, 1)),  txt_x, icon_h + 18)
         oled.show()
     except Exception as e:
         print("❌ Error en mostrar_datos:", e)
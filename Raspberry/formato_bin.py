@@ -0,0 +1,190 @@
+"""
+Formato binario de los registros de la tarjeta SD.
+
+Cada archivo diario `lecturas_AAAA-MM-DD.bin` empieza con una cabecera de 12
+bytes seguida de registros de ancho fijo, también de 12 bytes:
+
+    Cabecera: magia b'ECLM' | versión (u8) | tamaño de registro (u8) |
+              año del epoch del dispositivo (u16) | reservado (u32)
+    Registro: epoch (u32) | temperatura en centésimas de °C (i16) |
+              presión en Pa (u24) | humedad en centésimas de % (u16) |
+              CRC-8 de los 11 bytes anteriores (u8)
+
+Al ser de ancho fijo, el registro i está en `desplazamiento(i)` y se puede
+leer sin recorrer el archivo. El CRC permite detectar un registro a medio
+escribir si se corta la alimentación; en la versión 1 ese byte era reservado.
+
+El módulo solo depende de `struct`, por lo que también funciona en el PC como
+conversor a CSV:
+
+    python formato_bin.py lecturas_2025-01-31.bin [salida.csv]
+"""
+
+import struct
+
+from unidades import formatear_centi
+
+MAGIA = b'ECLM'
+VERSION = 2
+# Versiones que se pueden leer; a partir de la 2 el último byte es un CRC
+VERSIONES = (1, 2)
+CABECERA_FORMATO = '<4sBBHI'
+REGISTRO_FORMATO = '<IhHBHB'
+TAM_CABECERA = struct.calcsize(CABECERA_FORMATO)
+TAM_REGISTRO = struct.calcsize(REGISTRO_FORMATO)
+
+# Primera línea de los CSV diarios, los del dispositivo y los convertidos
+CABECERA_CSV = "Hora,Temperatura,Presion,Humedad,CRC\n"
+
+# Tabla del CRC-8 con polinomio 0x07 (x^8 + x^2 + x + 1)
+_TABLA_CRC8 = bytearray(256)
+for _i in range(256):
+    _c = _i
+    for _ in range(8):
+        _c = ((_c << 1) ^ 0x07) & 0xFF if _c & 0x80 else (_c << 1) & 0xFF
+    _TABLA_CRC8[_i] = _c
+
+# Segundos entre 1970-01-01 y el 1 de enero de los epochs usados por MicroPython
+EPOCH_UNIX = {1970: 0, 2000: 946684800}
+
+def cabecera(epoch_anio):
+    """
+    Construye la cabecera de un archivo binario.
+
+    Args:
+        epoch_anio (int): Año del epoch de `time.time()` en el dispositivo.
+
+    Returns:
+        bytes: Cabecera de `TAM_CABECERA` bytes.
+    """
+    return struct.pack(CABECERA_FORMATO, MAGIA, VERSION, TAM_REGISTRO, epoch_anio, 0)
+
+def leer_cabecera(datos):
+    """
+    Valida y decodifica una cabecera.
+
+    Returns:
+        tuple: (version, tam_registro, epoch_anio).
+
+    Raises:
+        ValueError: Si los datos no son una cabecera reconocida.
+    """
+    if len(datos) < TAM_CABECERA:
+        raise ValueError('Cabecera incompleta')
+    magia, version, tam, epoch_anio, _ = struct.unpack_from(CABECERA_FORMATO, datos, 0)
+    if magia != MAGIA or version not in VERSIONES or tam != TAM_REGISTRO:
+        raise ValueError('Formato de registro no soportado')
+    return version, tam, epoch_anio
+
+def crc8(buf, inicio=0, fin=None):
+    """
+    Calcula el CRC-8 de `buf[inicio:fin]` sin copiar los datos.
+
+    Returns:
+        int: CRC entre 0 y 255.
+    """
+    if fin is None:
+        fin = len(buf)
+    crc = 0
+    for i in range(inicio, fin):
+        crc = _TABLA_CRC8[crc ^ buf[i]]
+    return crc
+
+def valido(buf, offset=0):
+    """
+    Comprueba el CRC de un registro de la versión 2.
+    """
+    fin = offset + TAM_REGISTRO - 1
+    return buf[fin] == crc8(buf, offset, fin)
+
+def desplazamiento(i):
+    """
+    Devuelve la posición en bytes del registro i dentro del archivo.
+    """
+    return TAM_CABECERA + i * TAM_REGISTRO
+
+def empaquetar_en(buf, offset, t, temp, pres, hum):
+    """
+    Escribe un registro con su CRC en `buf` a partir de `offset`, sin reservar memoria.
+
+    Args:
+        buf (bytearray): Búfer destino.
+        offset (int): Posición inicial dentro de `buf`.
+        t (int): Marca de tiempo en segundos.
+        temp (int): Temperatura en centésimas de °C.
+        pres (int): Presión en Pa.
+        hum (int): Humedad en centésimas de %.
+    """
+    struct.pack_into(REGISTRO_FORMATO, buf, offset,
+                     t, temp, pres & 0xFFFF, pres >> 16, hum, 0)
+    fin = offset + TAM_REGISTRO - 1
+    buf[fin] = crc8(buf, offset, fin)
+
+def desempaquetar(buf, offset=0):
+    """
+    Lee un registro de `buf`.
+
+    Returns:
+        tuple: (t, temperatura, presion, humedad).
+    """
+    t, temp, p_bajo, p_alto, hum, _ = struct.unpack_from(REGISTRO_FORMATO, buf, offset)
+    return t, temp, p_bajo | (p_alto << 16), hum
+
+def linea_csv(hora, temp, pres, hum):
+    """
+    Formatea un registro como línea del CSV diario, con el CRC-8 del texto
+    anterior a la última coma.
+
+    Args:
+        hora (tuple): Tupla de tiempo con la hora en las posiciones 3 a 5.
+
+    Returns:
+        str: Línea 'HH:MM:SS,24.13,1013.25,45.20,CRC' con su salto de línea.
+    """
+    texto = "{:02d}:{:02d}:{:02d},{},{},{}".format(
+        hora[3], hora[4], hora[5],
+        formatear_centi(temp), formatear_centi(pres), formatear_centi(hum))
+    return "{},{:02X}\n".format(texto, crc8(texto.encode()))
+
+def convertir_a_csv(entrada, salida):
+    """
+    Convierte un archivo binario en un CSV con la misma cabecera y columnas,
+    CRC incluido, que el registro en texto del dispositivo. Pensado para
+    ejecutarse en el PC.
+    Los registros con CRC incorrecto se omiten.
+
+    Args:
+        entrada: Archivo binario abierto en modo 'rb'.
+        salida: Archivo de texto abierto en modo escritura.
+
+    Returns:
+        int: Número de registros convertidos.
+    """
+    import time
+    version, _, epoch_anio = leer_cabecera(entrada.read(TAM_CABECERA))
+    ajuste = EPOCH_UNIX.get(epoch_anio, 0)
+    salida.write(CABECERA_CSV)
+    n = 0
+    while True:
+        bloque = entrada.read(TAM_REGISTRO)
+        if len(bloque) < TAM_REGISTRO:
+            break
+        if version >= 2 and not valido(bloque):
+            continue
+        t, temp, pres, hum = desempaquetar(bloque)
+        salida.write(linea_csv(time.gmtime(t + ajuste), temp, pres, hum))
+        n += 1
+    return n
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 2:
+        print("Uso: python formato_bin.py archivo.bin [salida.csv]")
+        sys.exit(1)
+    with open(sys.argv[1], 'rb') as f_in:
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], 'w') as f_out:
+                total = convertir_a_csv(f_in, f_out)
+        else:
+            total = convertir_a_csv(f_in, sys.stdout)
+    print("Registros convertidos:", total, file=sys.stderr)
@@ -0,0 +1,136 @@
+"""
+Historial circular de muestras recientes en RAM.
+
+Guarda las últimas lecturas en cuatro columnas `array('i')` de capacidad fija
+(tiempo, temperatura, presión y humedad), de modo que la memoria usada se
+conoce de antemano: 16 bytes por muestra. Con la capacidad por defecto y una
+muestra por minuto se cubren las últimas 6 horas en menos de 6 KB.
+"""
+
+from array import array
+
+class HistorialRAM:
+    """
+    Búfer circular de muestras con inserción O(1) y consultas por ventana.
+
+    Las muestras deben insertarse en orden creciente de tiempo, lo que permite
+    localizar la primera muestra de una ventana por búsqueda binaria.
+
+    Atributos:
+        capacidad (int): Número máximo de muestras almacenadas.
+        t (array): Marca de tiempo en segundos (epoch del dispositivo).
+        temp (array): Temperatura en centésimas de °C.
+        pres (array): Presión en Pa.
+        hum (array): Humedad en centésimas de %.
+    """
+
+    def __init__(self, capacidad=360):
+        """
+        Reserva las columnas del historial.
+
+        Args:
+            capacidad (int): Número máximo de muestras.
+        """
+        self.capacidad = capacidad
+        self.t = array('i', (0 for _ in range(capacidad)))
+        self.temp = array('i', (0 for _ in range(capacidad)))
+        self.pres = array('i', (0 for _ in range(capacidad)))
+        self.hum = array('i', (0 for _ in range(capacidad)))
+        self._siguiente = 0
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def append(self, t, temp, pres, hum):
+        """
+        Agrega una muestra, sobrescribiendo la más antigua si el búfer está lleno.
+
+        Args:
+            t (int): Marca de tiempo en segundos.
+            temp (int): Temperatura en centésimas de °C.
+            pres (int): Presión en Pa.
+            hum (int): Humedad en centésimas de %.
+        """
+        i = self._siguiente
+        self.t[i] = t
+        self.temp[i] = temp
+        self.pres[i] = pres
+        self.hum[i] = hum
+        self._siguiente = (i + 1) % self.capacidad
+        if self._n < self.capacidad:
+            self._n += 1
+
+    def _fisico(self, i):
+        """
+        Convierte un índice lógico (0 = muestra más antigua) en posición del búfer.
+        """
+        return (self._siguiente - self._n + i) % self.capacidad
+
+    def registro(self, i):
+        """
+        Devuelve la i-ésima muestra, contando desde la más antigua.
+
+        Returns:
+            tuple: (t, temperatura, presion, humedad).
+        """
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError('indice fuera del historial')
+        j = self._fisico(i)
+        return self.t[j], self.temp[j], self.pres[j], self.hum[j]
+
+    def ultimo(self):
+        """
+        Devuelve la muestra más reciente, o None si el historial está vacío.
+        """
+        return self.registro(-1) if self._n else None
+
+    def buscar(self, t):
+        """
+        Busca la primera muestra con tiempo mayor o igual a `t` (O(log n)).
+
+        Returns:
+            int: Índice lógico de la muestra, o `len(self)` si no hay ninguna.
+        """
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.t[self._fisico(mid)] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def ultimos(self, n):
+        """
+        Recorre las últimas `n` muestras, de la más antigua a la más reciente.
+
+        Yields:
+            tuple: (t, temperatura, presion, humedad).
+        """
+        n = min(n, self._n)
+        return self._recorrer(self._n - n, self._n)
+
+    def desde(self, t, hasta=None):
+        """
+        Recorre las muestras con tiempo en [t, hasta].
+
+        Args:
+            t (int): Tiempo inicial en segundos.
+            hasta (int, optional): Tiempo final en segundos (incluido).
+
+        Yields:
+            tuple: (t, temperatura, presion, humedad).
+        """
+        fin = self._n if hasta is None else self.buscar(hasta + 1)
+        return self._recorrer(self.buscar(t), fin)
+
+    def _recorrer(self, inicio, fin):
+        """
+        Generador sobre el rango lógico [inicio, fin) sin copiar las columnas.
+        """
+        for i in range(inicio, fin):
+            j = self._fisico(i)
+            yield self.t[j], self.temp[j], self.pres[j], self.hum[j]
@@ -16,7 +16,7 @@ Dependencias:
     - time, ntptime
     - ssd1306
     - ujson, os
-    - clima, sensors, comunicacion, sd_logger, display (módulos personalizados)
+    - clima, sensors, comunicacion, sd_logger, display, planificador (módulos personalizados)
 """
 
 import uasyncio as asyncio
@@ -28,14 +28,24 @@ import ujson as json
 import os
 
 from clima import determinar_condiciones_climaticas
-from sensors import BME280
+from sensors import BME280, format_temperature, format_pressure, format_humidity
+from historial import HistorialRAM
 from comunicacion import WiFiManager, WebSocketServer
 from sd_logger import SDLogger
 from display import mostrar_datos, mostrar_logo
+from planificador import Planificador
 
 # Pines sensores
 BME_I2C_SDA_PIN = 26
 BME_I2C_SCL_PIN = 27
+BME_CALIB_CACHE = '/bme280_calib.bin'
+# Perfil de muestreo continuo del BME280 y periodo de lectura de `bme_task`
+BME_PROFILE = 'weather'
+BME_PERIODO_S = 1
+
+# Historial en RAM: una muestra por minuto durante las últimas 6 horas
+HISTORIAL_INTERVALO_S = 60
+HISTORIAL_CAPACIDAD = 360
 
 # Pines SD
 SD_SPI_ID = 0
@@ -43,6 +53,25 @@ SD_SCK_PIN = 18
 SD_MOSI_PIN = 19
 SD_MISO_PIN = 16
 SD_CS_PIN = 17
+# Formato de los archivos diarios: 'csv' o 'bin' (registros de 12 bytes)
+SD_FORMATO = 'bin'
+# Periodo de registro en la SD; las escrituras reales se agrupan en el búfer del logger
+SD_INTERVALO_S = 60
+# Retención en la SD: registros crudos, resúmenes por minuto y (sin límite) horarios
+SD_RETENCION_DIAS = 30
+SD_RETENCION_MINUTOS_DIAS = 365
+# Año mínimo para considerar válida la hora del RTC sin NTP (al arrancar, el
+# RTC del RP2040 empieza en 2021-01-01)
+RELOJ_ANIO_MIN = 2024
+
+# Frecuencias de las tareas del planificador (segundos). Pantalla, envío y
+# registro en SD se ejecutan al llegar una muestra nueva, como máximo a estas tasas
+PANTALLA_INTERVALO_S = 5
+ENVIO_INTERVALO_S = 60
+HISTORIAL_ENVIO_S = 60
+CONECTIVIDAD_S = 5
+# Tiempo que se muestra el logo antes de empezar a conectar el Wi-Fi
+LOGO_S = 3
 
 # Pines OLED
 OLED_I2C_SDA_PIN = 2
@@ -61,24 +90,55 @@ def debug(*args):
 # Instanciar hardware
 debug("🛠️ Inicializando sensores y pantallas")
 i2c0 = I2C(0, scl=Pin(BME_I2C_SCL_PIN), sda=Pin(BME_I2C_SDA_PIN))
-bme = BME280.BME280(i2c=i2c0)
+bme = BME280(i2c=i2c0, calib_cache=BME_CALIB_CACHE, profile=BME_PROFILE)
 i2c1 = I2C(1, scl=Pin(OLED_I2C_SCL_PIN), sda=Pin(OLED_I2C_SDA_PIN))
 oled = ssd1306.SSD1306_I2C(128, 64, i2c1)
 
 # Logger SD
-sd_logger = SDLogger(SD_SPI_ID, SD_SCK_PIN, SD_MOSI_PIN, SD_MISO_PIN, SD_CS_PIN)
+sd_logger = SDLogger(SD_SPI_ID, SD_SCK_PIN, SD_MOSI_PIN, SD_MISO_PIN, SD_CS_PIN,
+                     formato=SD_FORMATO, retencion_dias=SD_RETENCION_DIAS,
+                     retencion_minutos_dias=SD_RETENCION_MINUTOS_DIAS)
+
+# Historial reciente en RAM
+historial = HistorialRAM(HISTORIAL_CAPACIDAD)
 
 # Conectividad
 wifi = WiFiManager()
-ws_server = WebSocketServer(sd_logger)
+ws_server = WebSocketServer(sd_logger, historial=historial)
 
 # Estados globales
+# Última lectura en enteros: centésimas de °C, centésimas de % y Pa
 last_data = {"temp": None, "hum": None, "pres": None}
 ultimo_mensaje = None
-last_send_time = 0
-last_hist_time = 0
-last_slog_time = 0
+ultima_muestra_hist = None
 presion_anterior = None
+hora_sincronizada = False
+
+# Planificador de tareas y aviso de lectura nueva del sensor
+planificador = Planificador()
+muestra_nueva = asyncio.Event()
+
+def crear_mensaje(temp, hum, pres, cond):
+    """
+    Construye el último dato a partir de las lecturas enteras. Se guarda sin
+    convertir; `comunicacion.mensaje_json` lo pasa a °C, % y hPa solo al
+    enviarlo en JSON.
+
+    Args:
+        temp (int): Temperatura en centésimas de °C.
+        hum (int): Humedad en centésimas de %.
+        pres (int): Presión en Pa.
+        cond (str): Condición climática.
+
+    Returns:
+        dict: {"temperatura", "humedad", "presion", "condicion"} con los enteros.
+    """
+    return {
+        "temperatura": temp,
+        "humedad": hum,
+        "presion": pres,
+        "condicion": cond
+    }
 
 # Sincronizar hora vía NTP
 async def sync_ntp():
@@ -86,10 +146,12 @@ async def sync_ntp():
     Sincroniza la hora del sistema con un servidor NTP.
     Reintenta hasta 5 veces si hay conexión Wi-Fi.
     """
+    global hora_sincronizada
     for _ in range(5):
         if wifi.is_connected():
             try:
                 ntptime.settime()
+                hora_sincronizada = True
                 debug("🕒 Hora sincronizada con NTP")
                 return
             except Exception as e:
@@ -97,133 +159,150 @@ async def sync_ntp():
         await asyncio.sleep(2)
     debug("❌ No se pudo sincronizar NTP tras varios intentos")
 
+def reloj_valido():
+    """
+    Indica si la hora del sistema es fiable para registrar muestras: ya se
+    sincronizó por NTP o el RTC conserva una fecha plausible de antes.
+    """
+    return hora_sincronizada or time.localtime()[0] >= RELOJ_ANIO_MIN
+
 # Lectura BME280
-async def bme_task():
+async def leer_sensor():
     """
-    Tarea asíncrona que lee periódicamente los datos del sensor BME280.
-    Actualiza la variable global `last_data` cada 15 segundos.
+    Lee el BME280 y actualiza la variable global `last_data`.
+
+    El sensor mide de forma continua según `BME_PROFILE`, así que cada lectura
+    es una sola ráfaga de registros sin bloquear el bucle de eventos. Agrega
+    una muestra a `historial` cada `HISTORIAL_INTERVALO_S` segundos, pasa
+    todas las lecturas a los resúmenes por minuto y por hora de la SD y
+    activa `muestra_nueva` para las tareas que dependen de la lectura.
+    Mientras la hora no sea válida (ver `reloj_valido`) no se guarda nada con
+    marca de tiempo, para no mezclar fechas falsas con el historial real.
     """
-    while True:
-        try:
-            last_data["temp"] = bme.temperature
-            last_data["hum"] = bme.humidity
-            last_data["pres"] = bme.pressure
-            debug(f"🌡️ Temp: {last_data['temp']}°C | 🧭 Pres: {last_data['pres']} hPa")
-        except Exception as e:
-            debug("⚠️ Error al leer BMP280:", e)
-        await asyncio.sleep(15)
+    global ultima_muestra_hist
+    try:
+        temp, pres, hum = await bme.read_async(poll_status=True)
+    except Exception as e:
+        debug("⚠️ Error al leer BMP280:", e)
+        return
+    last_data["temp"] = temp
+    last_data["hum"] = hum
+    last_data["pres"] = pres
+    if reloj_valido():
+        sd_logger.resumir(temp, pres, hum)
+        now = time.time()
+        if ultima_muestra_hist is None or now - ultima_muestra_hist >= HISTORIAL_INTERVALO_S:
+            historial.append(now, temp, pres, hum)
+            ultima_muestra_hist = now
+    debug(f"🌡️ Temp: {format_temperature(temp)} | 🧭 Pres: {format_pressure(pres)}")
+    muestra_nueva.set()
+
+def actualizar_mensaje():
+    """
+    Calcula la condición climática de la última lectura y actualiza
+    `ultimo_mensaje` y `presion_anterior`.
+
+    Returns:
+        tuple: (mensaje, condicion).
+    """
+    global ultimo_mensaje, presion_anterior
+    cond = determinar_condiciones_climaticas(
+        last_data["temp"], last_data["hum"], last_data["pres"], presion_anterior=presion_anterior
+    )
+    ultimo_mensaje = crear_mensaje(last_data["temp"], last_data["hum"], last_data["pres"], cond)
+    presion_anterior = last_data["pres"]
+    return ultimo_mensaje, cond
 
 # Gestión Wi-Fi y servidor
-async def task_connectivity():
+async def revisar_conectividad():
     """
     Administra la conectividad Wi-Fi y la inicialización del servidor WebSocket.
     Intenta reconectar si se pierde la conexión y reinicia el servidor WebSocket si no está activo.
+    La conexión cede el bucle de eventos mientras espera y respeta la espera
+    exponencial de `WiFiManager`, así que lectura, registro y pantalla siguen
+    funcionando sin Wi-Fi.
+    Al conectar, programa la sincronización NTP como tarea de una sola vez.
     """
-    while True:
-        if not wifi.is_connected():
-            debug("📡 Intentando conectar Wi-Fi...")
-            wifi.connect()
-            if wifi.is_connected():
-                debug(f"Conectado correctamente. IP: {wifi.get_ip()}")
-                await sync_ntp()
-                ws_server.start(ultimo_mensaje)
-        else:
-            await asyncio.sleep(10)
-            if not ws_server.running:
-                debug("🔁 Reiniciando WebSocket Server")
-                ws_server.start(ultimo_mensaje)
-        if wifi.lost_connection():
-            debug("❌ Wi-Fi desconectado")
-            ws_server.stop()
-        await asyncio.sleep(3)
+    if wifi.lost_connection():
+        debug("❌ Wi-Fi desconectado")
+        ws_server.stop()
+    if not wifi.is_connected():
+        if not wifi.retry_due():
+            return
+        debug("📡 Intentando conectar Wi-Fi...")
+        if await wifi.connect():
+            debug(f"Conectado correctamente. IP: {wifi.get_ip()}")
+            planificador.una_vez(0, sync_ntp)
+            ws_server.start(ultimo_mensaje)
+    elif not ws_server.running:
+        debug("🔁 Reiniciando WebSocket Server")
+        ws_server.start(ultimo_mensaje)
 
 # Mostrar en OLED
-async def task_display():
+def refrescar_pantalla():
     """
-    Muestra los datos en una pantalla OLED.
-
-    Si los datos aún no están disponibles, muestra un logo de espera.
-    Una vez disponibles, se actualiza con datos ambientales y estado del sistema.
+    Muestra en la pantalla OLED la última lectura y el estado del sistema.
+    Se ejecuta con cada muestra nueva, como máximo cada `PANTALLA_INTERVALO_S` segundos.
     """
-    showed_logo = False
-    while True:
-        ws_server.update_flags(sd_logger.sd_montada)
-        if None in last_data.values():
-            if not showed_logo:
-                debug("🖼️ Mostrando logo de espera en OLED")
-                mostrar_logo(oled)
-                showed_logo = True
-        else:
-            cond = determinar_condiciones_climaticas(
-                last_data["temp"], last_data["hum"], last_data["pres"], presion_anterior=presion_anterior
-            )
-            debug(f"📺 Mostrando OLED: {last_data['temp']}°C, {last_data['hum']}%, {last_data['pres']}hPa, Cond: {cond}")
-            mostrar_datos(
-                oled,
-                last_data["temp"], last_data["hum"], last_data["pres"],
-                cond,
-                enviando=ws_server.flags['enviando'],
-                conectado=ws_server.flags['conectado'],
-                guardando=ws_server.flags['guardando']
-            )
-            showed_logo = False
-        await asyncio.sleep(5)
+    ws_server.update_flags(sd_logger.sd_montada)
+    _, cond = actualizar_mensaje()
+    debug(f"📺 Mostrando OLED: {format_temperature(last_data['temp'])}, {format_humidity(last_data['hum'])}, {format_pressure(last_data['pres'])}, Cond: {cond}")
+    mostrar_datos(
+        oled,
+        last_data["temp"], last_data["hum"], last_data["pres"],
+        cond,
+        enviando=ws_server.flags['enviando'],
+        conectado=ws_server.flags['conectado'],
+        guardando=ws_server.flags['guardando']
+    )
 
 # Log y envío de datos/historial
-async def task_log_and_send():
+async def publicar():
     """
-    Tarea principal de manejo de datos:
-        - Envía datos actuales cada 60 segundos por WebSocket.
-        - Envía el historial cada 60 segundos si hay conexión WebSocket.
-        - Guarda en la SD cada 10 minutos si está montada.
-        - Actualiza `ultimo_mensaje` y `presion_anterior`.
+    Envía la lectura actual por WebSocket si hay clientes conectados.
+    Se ejecuta con cada muestra nueva, como máximo cada `ENVIO_INTERVALO_S` segundos.
     """
-    global ultimo_mensaje, last_send_time, last_slog_time, last_hist_time, presion_anterior
-    while not wifi.is_connected():
-        await asyncio.sleep(1)
-    while True:
-        now = time.time()
-        ws_server.update_flags(sd_logger.sd_montada)
-
-        if None in last_data.values():
-            await asyncio.sleep(5)
-            continue
+    msg, _ = actualizar_mensaje()
+    if ws_server.connections:
+        debug("📤 Enviando datos actuales por WebSocket", ws_server.estadisticas())
+        await ws_server.handle_sending(data=msg, send_history=False)
 
+async def transmitir_muestra():
+    """
+    Envía la lectura nueva a los clientes suscritos, según la tasa máxima y la
+    banda muerta que pidió cada uno. Se ejecuta con cada muestra nueva.
+    """
+    if ws_server.suscripciones:
         cond = determinar_condiciones_climaticas(
             last_data["temp"], last_data["hum"], last_data["pres"], presion_anterior=presion_anterior
         )
-        msg = {
-            "temperatura": last_data["temp"],
-            "humedad": last_data["hum"],
-            "presion": last_data["pres"],
-            "condicion": cond
-        }
-        ultimo_mensaje = msg
-
-        if ws_server.connections:
-            if now - last_send_time >= 60:
-                debug("📤 Enviando datos actuales por WebSocket")
-                await ws_server.handle_sending(data=msg, send_history=False)
-                last_send_time = now
-
-            if now - last_hist_time >= 60:
-                debug("📦 Enviando historial por WebSocket")
-                await ws_server.handle_sending(data=None, send_history=True)
-                last_hist_time = now
-
-        if sd_logger.sd_montada and now - last_slog_time >= 600:
-            debug("💾 Guardando en SD")
-            sd_logger.log_data(
-                last_data["temp"], last_data["pres"], last_data["hum"]
-            )
-            last_slog_time = now
-
-        presion_anterior = last_data["pres"]
-        await asyncio.sleep(5)
+        await ws_server.publicar_muestra(last_data["temp"], last_data["hum"], last_data["pres"], cond)
+
+async def enviar_historial():
+    """
+    Envía el historial por WebSocket si hay clientes conectados.
+    """
+    if ws_server.connections:
+        debug("📦 Enviando historial por WebSocket")
+        await ws_server.handle_sending(data=None, send_history=True)
+
+def guardar_en_sd():
+    """
+    Guarda la última lectura en la SD si está montada y la hora es válida.
+    Se ejecuta con cada muestra nueva, como máximo cada `SD_INTERVALO_S` segundos.
+    """
+    if not reloj_valido():
+        debug("🕒 Hora sin sincronizar, no se guarda en SD")
+        return
+    if sd_logger.sd_montada:
+        debug("💾 Guardando en SD")
+        sd_logger.log_data(
+            last_data["temp"], last_data["pres"], last_data["hum"]
+        )
 
 async def main():
     """
-    Función principal que inicializa componentes, monta la SD y lanza las tareas asíncronas del sistema.
+    Función principal que inicializa componentes, monta la SD y registra las tareas del sistema en el planificador.
     Verifica la existencia de la configuración Wi-Fi y carga el último dato guardado si está disponible.
     """
     global presion_anterior, ultimo_mensaje
@@ -233,13 +312,11 @@ async def main():
         debug("✅ SD montada correctamente")
         d = sd_logger.leer_ultimo_dato()
         if d:
-            parts = d.strip().split(',')
-            if len(parts) == 4:
-                temp, pres, hum = map(float, parts[1:4])
-                presion_anterior = pres
-                cond0 = determinar_condiciones_climaticas(temp, hum, pres)
-                ultimo_mensaje = {"temperatura": temp, "humedad": hum, "presion": pres, "condicion": cond0}
-                debug(f"🔁 Último dato cargado: {ultimo_mensaje}")
+            _, temp, pres, hum = d
+            presion_anterior = pres
+            cond0 = determinar_condiciones_climaticas(temp, hum, pres)
+            ultimo_mensaje = crear_mensaje(temp, hum, pres, cond0)
+            debug(f"🔁 Último dato cargado: {ultimo_mensaje}")
     except Exception as e:
         debug("⚠️ Error al inicializar SD o leer datos:", e)
 
@@ -248,15 +325,22 @@ async def main():
         with open('/wifi_config.json', 'w') as f:
             json.dump({"networks": [], "static": {}}, f)
 
-    debug("🚀 Iniciando tareas asincrónicas")
-    asyncio.create_task(task_display())
-    await asyncio.sleep(3)
-    asyncio.create_task(task_connectivity())
-    asyncio.create_task(bme_task())
-    asyncio.create_task(task_log_and_send())
+    debug("🖼️ Mostrando logo de espera en OLED")
+    mostrar_logo(oled)
 
-    while True:
-        await asyncio.sleep(1)
+    debug("🚀 Iniciando planificador")
+    planificador.cada(BME_PERIODO_S * 1000, leer_sensor)
+    planificador.cada(CONECTIVIDAD_S * 1000, revisar_conectividad, inicio_ms=LOGO_S * 1000)
+    planificador.cada(HISTORIAL_ENVIO_S * 1000, enviar_historial, inicio_ms=HISTORIAL_ENVIO_S * 1000)
+    planificador.al_evento(muestra_nueva, refrescar_pantalla, PANTALLA_INTERVALO_S * 1000)
+    planificador.al_evento(muestra_nueva, publicar, ENVIO_INTERVALO_S * 1000)
+    planificador.al_evento(muestra_nueva, transmitir_muestra)
+    planificador.al_evento(muestra_nueva, guardar_en_sd, SD_INTERVALO_S * 1000)
+    await planificador.ejecutar()
 
 debug("🧠 Ejecutando main()")
-asyncio.run(main())
+try:
+    asyncio.run(main())
+finally:
+    # No perder lo que quede en el búfer de la SD al detener el programa
+    sd_logger.desmontar()
@@ -0,0 +1,197 @@
+"""
+Planificador de tareas por plazos para el bucle principal.
+
+Reúne en un solo lugar las tareas periódicas, las de una sola vez y las que
+se disparan con un `asyncio.Event`. En lugar de que cada tarea despierte con
+su propio `sleep` para comprobar si ya le toca, el planificador duerme hasta
+el plazo más cercano (o hasta que se registra una tarea nueva), de modo que
+el microcontrolador solo despierta cuando hay trabajo.
+"""
+
+import uasyncio as asyncio
+import time
+
+class Tarea:
+    """
+    Trabajo registrado en el `Planificador`.
+
+    Atributos:
+        nombre (str): Nombre usado en los mensajes de error.
+        funcion: Función o corrutina sin argumentos.
+        periodo_ms (int): Periodo en ms (tareas periódicas), intervalo mínimo
+            entre ejecuciones (tareas por evento) o None (una sola vez).
+        proximo (int): Plazo de la siguiente ejecución, en `ticks_ms`.
+        activa (bool): False una vez cancelada o, si es de una sola vez, ejecutada.
+        ejecutando (bool): True mientras la ejecución anterior no ha terminado.
+    """
+
+    def __init__(self, nombre, funcion, periodo_ms, proximo):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.periodo_ms = periodo_ms
+        self.proximo = proximo
+        self.activa = True
+        self.ejecutando = False
+
+    def cancelar(self):
+        """
+        Evita que la tarea vuelva a ejecutarse.
+        """
+        self.activa = False
+
+async def _ejecutar(tarea):
+    """
+    Ejecuta una vez la función de la tarea, esperándola si es una corrutina.
+    Los errores se informan sin detener el planificador.
+    """
+    tarea.ejecutando = True
+    try:
+        resultado = tarea.funcion()
+        if hasattr(resultado, 'send'):
+            await resultado
+    except Exception as e:
+        print("⚠️ Error en la tarea {}:".format(tarea.nombre), e)
+    finally:
+        tarea.ejecutando = False
+
+class Planificador:
+    """
+    Planificador de tareas con plazos en `ticks_ms`.
+
+    Cada ejecución de una tarea con plazo se lanza en su propia tarea de
+    asyncio, así que una corrutina lenta (por ejemplo, una conexión Wi-Fi) no
+    retrasa a las demás; si una ejecución sigue en curso cuando vence el
+    siguiente plazo, ese ciclo se omite.
+    """
+
+    def __init__(self):
+        self._tareas = []
+        self._cambio = asyncio.Event()
+        # Evento compartido -> eventos propios de cada tarea suscrita
+        self._repartos = {}
+
+    def cada(self, periodo_ms, funcion, inicio_ms=0, nombre=None):
+        """
+        Registra una tarea periódica.
+
+        Args:
+            periodo_ms (int): Periodo en milisegundos.
+            funcion: Función o corrutina sin argumentos.
+            inicio_ms (int): Retraso de la primera ejecución.
+            nombre (str, optional): Nombre para los mensajes de error.
+
+        Returns:
+            Tarea: La tarea registrada.
+        """
+        return self._agregar(Tarea(nombre or funcion.__name__, funcion, periodo_ms,
+                                   time.ticks_add(time.ticks_ms(), inicio_ms)))
+
+    def una_vez(self, retraso_ms, funcion, nombre=None):
+        """
+        Registra una tarea que se ejecuta una sola vez tras `retraso_ms`.
+
+        Returns:
+            Tarea: La tarea registrada.
+        """
+        return self._agregar(Tarea(nombre or funcion.__name__, funcion, None,
+                                   time.ticks_add(time.ticks_ms(), retraso_ms)))
+
+    def al_evento(self, evento, funcion, intervalo_min_ms=0, nombre=None):
+        """
+        Registra una tarea que se ejecuta cada vez que se activa `evento`.
+
+        Si el evento llega antes de `intervalo_min_ms` desde la ejecución
+        anterior, la tarea se ejecuta al cumplirse ese intervalo y todas las
+        activaciones recibidas mientras tanto se agrupan en una sola. Varias
+        tareas pueden compartir el mismo evento: el planificador es el único
+        que lo limpia y reenvía cada activación a todas ellas.
+
+        Args:
+            evento (asyncio.Event): Evento que dispara la tarea.
+            funcion: Función o corrutina sin argumentos.
+            intervalo_min_ms (int): Tiempo mínimo entre ejecuciones.
+            nombre (str, optional): Nombre para los mensajes de error.
+
+        Returns:
+            Tarea: La tarea registrada.
+        """
+        tarea = Tarea(nombre or funcion.__name__, funcion, intervalo_min_ms, None)
+        propio = asyncio.Event()
+        if evento not in self._repartos:
+            self._repartos[evento] = []
+            asyncio.create_task(self._repartir(evento))
+        self._repartos[evento].append(propio)
+        asyncio.create_task(self._esperar_evento(tarea, propio))
+        return tarea
+
+    def _agregar(self, tarea):
+        self._tareas.append(tarea)
+        # Despierta el bucle por si el nuevo plazo es el más cercano
+        self._cambio.set()
+        return tarea
+
+    async def _repartir(self, evento):
+        """
+        Reenvía cada activación de un evento compartido a sus tareas suscritas.
+        """
+        while True:
+            await evento.wait()
+            evento.clear()
+            for propio in self._repartos[evento]:
+                propio.set()
+
+    async def _esperar_evento(self, tarea, evento):
+        """
+        Bucle de una tarea disparada por evento.
+        """
+        ultimo = None
+        while tarea.activa:
+            await evento.wait()
+            evento.clear()
+            if ultimo is not None:
+                espera = time.ticks_diff(time.ticks_add(ultimo, tarea.periodo_ms),
+                                         time.ticks_ms())
+                if espera > 0:
+                    await asyncio.sleep_ms(espera)
+                    evento.clear()
+            if not tarea.activa:
+                return
+            ultimo = time.ticks_ms()
+            await _ejecutar(tarea)
+
+    async def ejecutar(self):
+        """
+        Bucle principal: duerme hasta el plazo más cercano y lanza la tarea que vence.
+        No termina nunca.
+        """
+        while True:
+            self._tareas = [t for t in self._tareas if t.activa]
+            siguiente = None
+            for tarea in self._tareas:
+                if siguiente is None or time.ticks_diff(tarea.proximo, siguiente.proximo) < 0:
+                    siguiente = tarea
+            self._cambio.clear()
+            if siguiente is None:
+                await self._cambio.wait()
+                continue
+            espera = time.ticks_diff(siguiente.proximo, time.ticks_ms())
+            if espera > 0:
+                try:
+                    await asyncio.wait_for_ms(self._cambio.wait(), espera)
+                    # Hay una tarea nueva: se recalcula el plazo más cercano
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            if not siguiente.activa:
+                continue
+            ahora = time.ticks_ms()
+            if siguiente.periodo_ms is None:
+                siguiente.activa = False
+            else:
+                # Plazos fijos para no acumular deriva; si la tarea va atrasada,
+                # no se recuperan los ciclos perdidos
+                siguiente.proximo = time.ticks_add(siguiente.proximo, siguiente.periodo_ms)
+                if time.ticks_diff(siguiente.proximo, ahora) <= 0:
+                    siguiente.proximo = time.ticks_add(ahora, siguiente.periodo_ms)
+            if not siguiente.ejecutando:
+                asyncio.create_task(_ejecutar(siguiente))
@@ -0,0 +1,177 @@
+"""
+Protocolo de los mensajes WebSocket y su formato binario compacto.
+
+Las solicitudes del cliente son siempre JSON:
+
+    {"solicitud": "real"}: la última muestra cada vez que cambia.
+    {"solicitud": "suscribir", "canales": ["temperatura"], "max_hz": 1,
+        "banda": {"temperatura": 0.05}}: cada lectura nueva que cumpla la tasa
+        máxima y la banda muerta, con solo los canales pedidos.
+    {"solicitud": "historial"}: los últimos registros cada vez que cambian.
+    {"solicitud": "historial", "desde": t0, "hasta": t1, "resolucion": 60,
+        "limite": 500, "cursor": t, "delta": true}: los registros de un
+        intervalo (tiempos Unix; basta con uno de `desde`, `hasta` o `cursor`).
+
+La respuesta a un intervalo llega en bloques {"historial": [...],
+"resolucion": r, "cursor": t, "fin": bool, "truncado": bool}. `fin` indica
+que no quedan registros en el intervalo; `truncado`, que la respuesta se
+cortó en `limite` y la página siguiente se pide repitiendo la solicitud con
+`cursor`. El cursor es [t, n]: el epoch del siguiente registro que queda por
+enviar y cuántos registros con ese mismo epoch ya se enviaron, que se omiten
+al continuar.
+
+Un cliente que ofrece el subprotocolo `SUBPROTOCOLO` en la cabecera
+`Sec-WebSocket-Protocol` recibe tramas binarias en lugar de JSON. El primer
+byte indica el tipo de mensaje y los valores van en enteros (centésimas de °C
+y de %, Pa), los mismos que usa el resto del dispositivo:
+
+    Muestra (11 bytes): tipo 0x01 (u8) | canales presentes (u8, ver `BITS`) |
+        temperatura (i16) | presión (u32) | humedad (u16) | condición (u8)
+    Historial: tipo 0x02 (u8) | banderas (u8: `SIN_SD`, `ULTIMO`, `TRUNCADO`) |
+        año del epoch del dispositivo (u16) | resolución en s (u16) |
+        n.º de registros (u16) | epoch del cursor (u32, 0 si no queda
+        ninguno) | registros ya enviados con ese epoch (u16) |
+        n registros de 12 bytes:
+        epoch (u32) | temperatura (i16) | presión (u32) | humedad (u16)
+
+    Historial con deltas ("delta": true): tipo 0x03 y la misma cabecera,
+        seguida por cada registro de cuatro varints (tiempo, temperatura,
+        presión, humedad) con la diferencia respecto del registro anterior
+        (del cero en el primero) codificada en zig-zag
+
+Las series meteorológicas cambian poco de un registro al siguiente, así que
+casi todas las diferencias caben en un byte: unos 4 bytes por registro en
+lugar de 12, es decir, unas 3 veces menos que con registros de ancho fijo.
+
+`ULTIMO` y `TRUNCADO` son las versiones binarias de `fin` y `truncado`.
+La condición se envía como su índice en `CONDICIONES` (255 si no está). Los
+canales que no pidió una suscripción van a cero. La aplicación repite estas
+definiciones para decodificar los mensajes.
+"""
+
+import struct
+
+SUBPROTOCOLO = 'clima.bin.v1'
+
+TIPO_MUESTRA = 0x01
+TIPO_HISTORIAL = 0x02
+TIPO_HISTORIAL_DELTA = 0x03
+
+MUESTRA_FORMATO = '<BBhIHB'
+HISTORIAL_FORMATO = '<BBHHHIH'
+REGISTRO_FORMATO = '<IhIH'
+TAM_MUESTRA = struct.calcsize(MUESTRA_FORMATO)
+TAM_HISTORIAL = struct.calcsize(HISTORIAL_FORMATO)
+TAM_REGISTRO = struct.calcsize(REGISTRO_FORMATO)
+
+# Banderas del historial
+SIN_SD = 0x01
+ULTIMO = 0x02
+TRUNCADO = 0x04
+
+# Bit de cada canal en el byte de canales presentes
+BITS = {'temperatura': 0x01, 'humedad': 0x02, 'presion': 0x04, 'condicion': 0x08}
+TODOS = 0x0F
+
+# Condiciones de `clima.determinar_condiciones_climaticas`; el código es el índice
+CONDICIONES = ('normal_dia', 'normal_noche', 'despejado', 'nublado', 'lluvia',
+               'calor', 'frío', 'viento')
+SIN_CONDICION = 255
+
+def codigo_condicion(cond):
+    """
+    Devuelve el código numérico de una condición climática.
+    """
+    try:
+        return CONDICIONES.index(cond)
+    except ValueError:
+        return SIN_CONDICION
+
+def empaquetar_muestra(temp, hum, pres, cond, canales=None):
+    """
+    Serializa una lectura como mensaje de muestra.
+
+    Args:
+        temp (int): Temperatura en centésimas de °C.
+        hum (int): Humedad en centésimas de %.
+        pres (int): Presión en Pa.
+        cond (str): Condición climática.
+        canales (tuple, optional): Canales a incluir; por defecto, todos.
+
+    Returns:
+        bytes: Mensaje de `TAM_MUESTRA` bytes.
+    """
+    mascara = TODOS
+    if canales is not None:
+        mascara = 0
+        for canal in canales:
+            mascara |= BITS[canal]
+    return struct.pack(MUESTRA_FORMATO, TIPO_MUESTRA, mascara,
+                       temp if mascara & 0x01 else 0,
+                       pres if mascara & 0x04 else 0,
+                       hum if mascara & 0x02 else 0,
+                       codigo_condicion(cond) if mascara & 0x08 else SIN_CONDICION)
+
+def zigzag(n):
+    """
+    Convierte un entero con signo en uno sin signo con magnitud parecida
+    (0, -1, 1, -2... -> 0, 1, 2, 3...), para que los negativos pequeños
+    también ocupen pocos bytes como varint.
+    """
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+def agregar_varint(buf, n):
+    """
+    Añade a `buf` un entero sin signo en grupos de 7 bits, del menos
+    significativo al más significativo, con el bit alto a 1 salvo en el último.
+    """
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def empaquetar_historial(registros, epoch_anio, resolucion=0, cursor=None, ultimo=True,
+                         delta=False, truncado=False):
+    """
+    Serializa un bloque de registros del historial en un solo mensaje.
+
+    Args:
+        registros (list): Tuplas (t, temperatura, presion, humedad), o None si
+            la SD no está disponible.
+        epoch_anio (int): Año del epoch de `time.time()` en el dispositivo.
+        resolucion (int): 0 para registros crudos o el periodo del resumen.
+        cursor (tuple, optional): (epoch del siguiente registro pendiente,
+            registros con ese epoch ya enviados).
+        ultimo (bool): Si no quedan registros en el intervalo.
+        delta (bool): Si es True, con diferencias en varint (`TIPO_HISTORIAL_DELTA`).
+        truncado (bool): Si la respuesta termina por el límite de registros.
+
+    Returns:
+        bytearray: Mensaje de historial.
+    """
+    tipo = TIPO_HISTORIAL_DELTA if delta else TIPO_HISTORIAL
+    banderas = (ULTIMO if ultimo else 0) | (TRUNCADO if truncado else 0)
+    cursor_t, cursor_n = cursor or (0, 0)
+    cursor_n = min(cursor_n, 0xFFFF)
+    if registros is None:
+        return bytearray(struct.pack(HISTORIAL_FORMATO, tipo, banderas | SIN_SD,
+                                     epoch_anio, resolucion, 0, 0, 0))
+    if delta:
+        buf = bytearray(struct.pack(HISTORIAL_FORMATO, tipo, banderas, epoch_anio,
+                                    resolucion, len(registros), cursor_t, cursor_n))
+        t0 = temp0 = pres0 = hum0 = 0
+        for t, temp, pres, hum in registros:
+            agregar_varint(buf, zigzag(t - t0))
+            agregar_varint(buf, zigzag(temp - temp0))
+            agregar_varint(buf, zigzag(pres - pres0))
+            agregar_varint(buf, zigzag(hum - hum0))
+            t0, temp0, pres0, hum0 = t, temp, pres, hum
+        return buf
+    buf = bytearray(TAM_HISTORIAL + len(registros) * TAM_REGISTRO)
+    struct.pack_into(HISTORIAL_FORMATO, buf, 0, tipo, banderas, epoch_anio,
+                     resolucion, len(registros), cursor_t, cursor_n)
+    offset = TAM_HISTORIAL
+    for t, temp, pres, hum in registros:
+        struct.pack_into(REGISTRO_FORMATO, buf, offset, t, temp, pres, hum)
+        offset += TAM_REGISTRO
+    return buf
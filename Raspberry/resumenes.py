@@ -0,0 +1,172 @@
+"""
+Niveles de resumen para el almacenamiento a largo plazo en la SD.
+
+Además de los registros crudos, cada muestra alimenta agregadores por minuto y
+por hora que calculan mínimo, máximo y media de forma incremental. Cuando un
+periodo termina, su resumen se guarda como registro de ancho fijo de 32 bytes:
+
+    inicio del periodo (u32) | n.º de muestras (u16) |
+    temperatura mín/máx/media (3 x i16, centésimas de °C) |
+    presión mín/máx/media (3 x u32, Pa) |
+    humedad mín/máx/media (3 x u16, centésimas de %) |
+    CRC-8 de los 30 bytes anteriores (u8) | reservado (u8)
+
+Los resúmenes por minuto se agrupan en archivos mensuales
+(`minutos_AAAA-MM.bin`) y los horarios en archivos anuales (`horas_AAAA.bin`),
+sin cabecera, de modo que un año de historia horaria ocupa unos 280 KB.
+"""
+
+import struct
+import time
+
+from formato_bin import crc8
+
+RESUMEN_FORMATO = '<IHhhhIIIHHHBB'
+TAM_RESUMEN = struct.calcsize(RESUMEN_FORMATO)
+
+# Periodos de los niveles de resumen, en segundos
+MINUTO = 60
+HORA = 3600
+NIVELES = (MINUTO, HORA)
+
+class Agregador:
+    """
+    Acumula mínimo, máximo y suma por canal para un periodo fijo.
+
+    Atributos:
+        periodo (int): Duración del periodo en segundos.
+    """
+
+    def __init__(self, periodo):
+        """
+        Args:
+            periodo (int): Duración del periodo en segundos.
+        """
+        self.periodo = periodo
+        self._inicio = None
+        self._n = 0
+
+    def agregar(self, t, temp, pres, hum):
+        """
+        Incorpora una muestra. Si pertenece a un periodo nuevo, cierra el anterior.
+
+        Args:
+            t (int): Marca de tiempo en segundos.
+            temp (int): Temperatura en centésimas de °C.
+            pres (int): Presión en Pa.
+            hum (int): Humedad en centésimas de %.
+
+        Returns:
+            tuple or None: Resumen del periodo terminado (ver `cerrar`), o None.
+        """
+        inicio = t - t % self.periodo
+        terminado = None
+        if self._n and inicio != self._inicio:
+            terminado = self.cerrar()
+        if not self._n:
+            self._inicio = inicio
+            self._t_min = self._t_max = self._t_sum = temp
+            self._p_min = self._p_max = self._p_sum = pres
+            self._h_min = self._h_max = self._h_sum = hum
+            self._n = 1
+            return terminado
+        self._n += 1
+        self._t_sum += temp
+        self._p_sum += pres
+        self._h_sum += hum
+        if temp < self._t_min: self._t_min = temp
+        if temp > self._t_max: self._t_max = temp
+        if pres < self._p_min: self._p_min = pres
+        if pres > self._p_max: self._p_max = pres
+        if hum < self._h_min: self._h_min = hum
+        if hum > self._h_max: self._h_max = hum
+        return terminado
+
+    def cerrar(self):
+        """
+        Termina el periodo en curso.
+
+        Returns:
+            tuple or None: (inicio, n, t_min, t_max, t_media, p_min, p_max,
+            p_media, h_min, h_max, h_media), o None si no había muestras.
+        """
+        if not self._n:
+            return None
+        n = self._n
+        self._n = 0
+        return (self._inicio, n,
+                self._t_min, self._t_max, self._t_sum // n,
+                self._p_min, self._p_max, self._p_sum // n,
+                self._h_min, self._h_max, self._h_sum // n)
+
+def empaquetar(resumen):
+    """
+    Serializa un resumen de `Agregador.cerrar` con su CRC.
+
+    Returns:
+        bytearray: Registro de `TAM_RESUMEN` bytes.
+    """
+    buf = bytearray(TAM_RESUMEN)
+    struct.pack_into(RESUMEN_FORMATO, buf, 0, *(tuple(resumen) + (0, 0)))
+    buf[TAM_RESUMEN - 2] = crc8(buf, 0, TAM_RESUMEN - 2)
+    return buf
+
+def valido(buf, offset=0):
+    """
+    Comprueba el CRC de un resumen.
+    """
+    fin = offset + TAM_RESUMEN - 2
+    return buf[fin] == crc8(buf, offset, fin)
+
+def desempaquetar(buf, offset=0):
+    """
+    Lee un resumen completo.
+
+    Returns:
+        tuple: Mismo formato que `Agregador.cerrar`.
+    """
+    return struct.unpack_from(RESUMEN_FORMATO, buf, offset)[:11]
+
+def desempaquetar_media(buf, offset=0):
+    """
+    Lee un resumen con la misma forma que un registro crudo.
+
+    Returns:
+        tuple: (inicio, temperatura media, presion media, humedad media).
+    """
+    r = struct.unpack_from(RESUMEN_FORMATO, buf, offset)
+    return r[0], r[4], r[7], r[10]
+
+def nombre_archivo(periodo, t):
+    """
+    Devuelve el nombre del archivo de resumen donde va el periodo que empieza en `t`.
+    """
+    lt = time.localtime(t)
+    if periodo == MINUTO:
+        return "minutos_{:04d}-{:02d}.bin".format(lt[0], lt[1])
+    return "horas_{:04d}.bin".format(lt[0])
+
+def periodo_de(nombre):
+    """
+    Devuelve el periodo de un archivo de resumen, o None si no lo es.
+    """
+    if not nombre.endswith(".bin"):
+        return None
+    if nombre.startswith("minutos_"):
+        return MINUTO
+    if nombre.startswith("horas_"):
+        return HORA
+    return None
+
+def rango_archivo(nombre):
+    """
+    Devuelve el intervalo de tiempo [inicio, fin) que cubre un archivo de resumen.
+    """
+    if periodo_de(nombre) == HORA:
+        anio = int(nombre[6:10])
+        return (time.mktime((anio, 1, 1, 0, 0, 0, 0, 0)),
+                time.mktime((anio + 1, 1, 1, 0, 0, 0, 0, 0)))
+    anio, mes = int(nombre[8:12]), int(nombre[13:15])
+    sig_anio, sig_mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return (time.mktime((anio, mes, 1, 0, 0, 0, 0, 0)),
+            time.mktime((sig_anio, sig_mes, 1, 0, 0, 0, 0, 0)))
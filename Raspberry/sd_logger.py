@@ -1,8 +1,85 @@
 import machine
 import uos as os
 import sdcard
+import struct
 import time
 
+from unidades import parsear_centi
+import formato_bin
+import resumenes
+
+# Índice disperso de los CSV: una entrada (epoch u32, offset u32) cada vez que
+# el archivo cruza un múltiplo de INDICE_CADA_BYTES, en `<archivo>.idx`
+INDICE_CADA_BYTES = 1024
+INDICE_FORMATO = '<II'
+TAM_INDICE = struct.calcsize(INDICE_FORMATO)
+
+# Bytes escritos entre dos consultas reales de espacio libre con statvfs
+CHEQUEO_CADA_BYTES = 64 * 1024
+
+# Duración máxima de una consulta que se responde con registros crudos o con
+# resúmenes por minuto; por encima se usan los resúmenes horarios
+RANGO_MAX_CRUDO = 2 * 86400
+RANGO_MAX_MINUTOS = 31 * 86400
+
+def es_archivo_registro(nombre):
+    """
+    Indica si un nombre de archivo corresponde a un registro diario (CSV o binario).
+    """
+    return nombre.startswith("lecturas_") and (
+        nombre.endswith(".csv") or nombre.endswith(".bin"))
+
+def epoch_del_archivo(nombre):
+    """
+    Devuelve el epoch de las 00:00:00 del día de un archivo `lecturas_AAAA-MM-DD.*`.
+    """
+    return time.mktime((int(nombre[9:13]), int(nombre[14:16]), int(nombre[17:19]),
+                        0, 0, 0, 0, 0))
+
+def parsear_linea(linea, base):
+    """
+    Convierte una línea 'HH:MM:SS,temp,pres,hum[,CRC]' del CSV en un registro numérico.
+
+    Si la línea trae la columna CRC (hexadecimal, CRC-8 del texto anterior a la
+    última coma), se comprueba. Las líneas que empiezan con '#' son comentarios.
+
+    Args:
+        linea (str): Línea del CSV.
+        base (int): Epoch de las 00:00 del día del archivo.
+
+    Returns:
+        tuple or None: (t, temperatura, presion, humedad), o None si la línea
+        no es un registro válido.
+    """
+    linea = linea.strip()
+    if not linea or linea[0] == '#':
+        return None
+    partes = linea.split(',')
+    if len(partes) < 4 or len(partes[0]) != 8:
+        return None
+    try:
+        if len(partes) > 4 and int(partes[4], 16) != formato_bin.crc8(
+                linea[:linea.rfind(',')].encode()):
+            return None
+        hora = partes[0]
+        t = base + int(hora[0:2]) * 3600 + int(hora[3:5]) * 60 + int(hora[6:8])
+        return (t, parsear_centi(partes[1]), parsear_centi(partes[2]),
+                parsear_centi(partes[3]))
+    except ValueError:
+        return None
+
+def validador_bin(f):
+    """
+    Lee la cabecera de un archivo binario abierto y devuelve la función que
+    valida sus registros, o None si el archivo no lleva CRC (versión 1).
+    """
+    f.seek(0)
+    try:
+        version = formato_bin.leer_cabecera(f.read(formato_bin.TAM_CABECERA))[0]
+    except ValueError:
+        return None
+    return formato_bin.valido if version >= 2 else None
+
 class SDLogger:
     """
     Clase para registrar y gestionar datos en una tarjeta SD.
@@ -13,11 +90,52 @@ class SDLogger:
         mount_point+: Punto de montaje de la SD.
         sd}: Objeto SDCard.
         filepath (str): Ruta del archivo actual de registro.
-        current_date (int): Día actual (usado para rotar el archivo diario).
+        current_date (tuple): Fecha actual (año, mes, día), usada para rotar el
+            archivo diario.
         sd_montada (bool): Estado de montaje de la SD.
+        formato (str): 'csv' para líneas de texto o 'bin' para registros de
+            ancho fijo de `formato_bin`.
+        flush_intervalo (int): Segundos máximos que un registro espera en el
+            búfer antes de escribirse en la SD.
+
+        retencion_dias (int): Días de registros crudos a conservar (None = sin límite).
+        retencion_minutos_dias (int): Días de resúmenes por minuto a conservar
+            (None = sin límite). Los resúmenes horarios no se borran por edad.
+        retencion_bytes (int): Tamaño total máximo de los registros crudos (None = sin límite).
+        minimo_libre (float): Fracción mínima de espacio libre en la SD.
+        generacion (int): Contador que aumenta con cada registro de `log_data`,
+            cada resumen nuevo y cada archivo borrado; permite a quien guarde
+            lecturas de la SD en caché saber si cambiaron.
+        borrados (int): Contador que aumenta con cada archivo borrado, el único
+            cambio que altera datos ya escritos.
+        ultimo_registro (dict): Marca de tiempo del registro más reciente de
+            cada nivel (0 para los crudos o el periodo del resumen) desde que
+            arrancó el dispositivo; los registros nuevos siempre son posteriores.
+
+    Los registros se acumulan en un búfer preasignado y se escriben en bloque
+    cuando el búfer se llena, cuando vence `flush_intervalo`, al rotar el
+    archivo diario o al llamar a `flush`/`desmontar`. Las lecturas no fuerzan
+    la escritura: `query` y `leer_ultimos` añaden lo que aún está en el búfer
+    a lo leído de la SD.
+
+    La lista de archivos y el espacio libre se obtienen una vez al montar y se
+    actualizan al crear, escribir y borrar archivos; `statvfs` solo se vuelve a
+    consultar al rotar el archivo diario o cada `CHEQUEO_CADA_BYTES` escritos.
+
+    Cada registro lleva un CRC-8 (último byte en binario, última columna en
+    CSV). Al montar la SD, `_recuperar` revisa hacia atrás el final de los
+    archivos en uso y neutraliza un registro a medio escribir por un corte de
+    alimentación; los lectores omiten los registros con CRC incorrecto.
+
+    Cada muestra pasada a `resumir` alimenta los agregadores de `resumenes`;
+    los resúmenes por minuto y por hora se escriben junto con el búfer y
+    permiten responder consultas de semanas o meses sin leer los registros
+    crudos, que pueden borrarse antes.
     """
 
-    def __init__(self, spi_id, sck_pin, mosi_pin, miso_pin, cs_pin):
+    def __init__(self, spi_id, sck_pin, mosi_pin, miso_pin, cs_pin, formato='csv',
+                 buffer_bytes=512, flush_intervalo=300, retencion_dias=None,
+                 retencion_bytes=None, minimo_libre=0.10, retencion_minutos_dias=None):
         """
         Inicializa el SPI y prepara los pines para la tarjeta SD.
 
@@ -27,7 +145,49 @@ class SDLogger:
             mosi_pin (int): Pin MOSI.
             miso_pin (int): Pin MISO.
             cs_pin (int): Pin chip select.
+            formato (str): Formato de los archivos diarios, 'csv' o 'bin'.
+            buffer_bytes (int): Tamaño del búfer de escritura.
+            flush_intervalo (int): Segundos máximos entre escrituras en la SD.
+            retencion_dias (int, optional): Días de registros crudos a conservar.
+            retencion_bytes (int, optional): Tamaño total máximo de los registros.
+            minimo_libre (float): Fracción mínima de espacio libre en la SD.
+            retencion_minutos_dias (int, optional): Días de resúmenes por minuto
+                a conservar.
+
+        Raises:
+            ValueError: Si el formato no es 'csv' ni 'bin'.
         """
+        if formato not in ('csv', 'bin'):
+            raise ValueError("Formato de registro no soportado: {}".format(formato))
+        self.formato = formato
+        self.flush_intervalo = flush_intervalo
+        self._buffer = bytearray(buffer_bytes)
+        self._pendientes = 0
+        self._ultimo_flush = time.time()
+        # Estado del índice del CSV actual
+        self._tam_archivo = 0
+        self._bloque_indexado = -1
+        self._indice_pend = []
+        # Búfer reutilizable para lecturas hacia atrás desde el final del archivo
+        self._lectura = bytearray(256)
+        self.generacion = 0
+        self.borrados = 0
+        self.ultimo_registro = {}
+        # Política de retención y estado incremental del espacio
+        self.retencion_dias = retencion_dias
+        self.retencion_bytes = retencion_bytes
+        self.minimo_libre = minimo_libre
+        self.retencion_minutos_dias = retencion_minutos_dias
+        self._archivos = []
+        # Niveles de resumen: agregadores en curso, registros terminados aún
+        # sin escribir (nombre de archivo, bytes) y archivos de cada nivel
+        self._agregadores = [resumenes.Agregador(p) for p in resumenes.NIVELES]
+        self._resumen_pend = []
+        self._resumenes = {p: [] for p in resumenes.NIVELES}
+        self._tamanos = {}
+        self._espacio_total = 0
+        self._espacio_libre = 0
+        self._sin_chequeo = 0
         self.spi = machine.SPI(
             spi_id,
             baudrate=1000000,
@@ -60,88 +220,711 @@ class SDLogger:
             os.mount(self.sd, self.mount_point)
             self.sd_montada = True
             print("[OK] SD Card montada en", self.mount_point)
+            self._cargar_archivos()
         except Exception as e:
             self.sd_montada = False
             print("❌ Error montando SD:", e)
             raise
 
+    def _cargar_archivos(self):
+        """
+        Lista una sola vez los archivos diarios y de resumen con su tamaño, y
+        mide el espacio libre.
+        """
+        self._archivos = []
+        self._tamanos = {}
+        for periodo in self._resumenes:
+            self._resumenes[periodo] = []
+        for nombre in os.listdir(self.mount_point):
+            if es_archivo_registro(nombre) or resumenes.periodo_de(nombre):
+                self._lista_de(nombre).append(nombre)
+                self._tamanos[nombre] = os.stat("{}/{}".format(self.mount_point, nombre))[6]
+        self._archivos.sort()
+        for lista in self._resumenes.values():
+            lista.sort()
+        self._recuperar()
+        self._medir_espacio()
+
+    def _lista_de(self, nombre):
+        """
+        Devuelve la lista en memoria a la que pertenece un archivo.
+        """
+        periodo = resumenes.periodo_de(nombre)
+        return self._resumenes[periodo] if periodo else self._archivos
+
+    def _recuperar(self):
+        """
+        Repara el final de los archivos en los que se estaba escribiendo al
+        cortarse la alimentación: el diario más reciente (y su índice) y el
+        último archivo de cada nivel de resumen.
+
+        Cada archivo se revisa hacia atrás desde el final hasta el último
+        registro válido, por lo que normalmente se leen uno o dos registros.
+        """
+        try:
+            if self._archivos:
+                nombre = self._archivos[-1]
+                if nombre.endswith(".bin"):
+                    with open("{}/{}".format(self.mount_point, nombre), 'rb') as f:
+                        valido = validador_bin(f)
+                    self._sellar_fijo(nombre, formato_bin.cabecera(time.gmtime(0)[0]),
+                                      formato_bin.TAM_REGISTRO, valido)
+                else:
+                    self._sellar_csv(nombre)
+                    if nombre + ".idx" in os.listdir(self.mount_point):
+                        self._sellar_fijo(nombre + ".idx", b'', TAM_INDICE, None)
+            for lista in self._resumenes.values():
+                if lista:
+                    self._sellar_fijo(lista[-1], b'', resumenes.TAM_RESUMEN,
+                                      resumenes.valido)
+        except OSError as e:
+            print("❌ Error en la recuperación de la SD:", e)
+
+    def _sellar_fijo(self, nombre, cabecera, tam, valido):
+        """
+        Deja un archivo de registros de ancho fijo terminado en un registro válido.
+
+        El sistema de archivos no permite truncar, así que la cola incompleta o
+        con CRC incorrecto se sobrescribe con copias del último registro válido
+        con el CRC alterado: conservan su marca de tiempo (el archivo sigue
+        ordenado para la búsqueda binaria) y los lectores las descartan, por lo
+        que no se duplican datos. Los archivos sin CRC se copian hasta el último
+        registro completo. Si no queda ningún registro válido, el archivo se
+        reescribe solo con la cabecera.
+
+        Args:
+            nombre (str): Nombre del archivo dentro del punto de montaje.
+            cabecera (bytes): Cabecera que precede a los registros.
+            tam (int): Tamaño de cada registro.
+            valido: Función (buf) -> bool, o None para comprobar solo el tamaño.
+        """
+        ruta = "{}/{}".format(self.mount_point, nombre)
+        vista = memoryview(self._lectura)[:tam]
+        with open(ruta, 'r+b') as f:
+            total = f.seek(0, 2)
+            k = (total - len(cabecera)) // tam if total >= len(cabecera) else 0
+            while k > 0:
+                f.seek(len(cabecera) + (k - 1) * tam)
+                f.readinto(vista)
+                if valido is None or valido(self._lectura):
+                    break
+                k -= 1
+            fin = len(cabecera) + k * tam
+            if fin == total:
+                return
+            if k and valido is not None:
+                # Se altera el primer byte, desde el final, que invalida el registro
+                for i in range(tam - 1, -1, -1):
+                    self._lectura[i] ^= 0xFF
+                    if not valido(self._lectura):
+                        break
+                    self._lectura[i] ^= 0xFF
+                f.seek(fin)
+                while fin < total:
+                    f.write(vista)
+                    fin += tam
+        if not k:
+            with open(ruta, 'wb') as f:
+                f.write(cabecera)
+        elif valido is None:
+            self._truncar(ruta, fin)
+        print("🩹 Final de archivo reparado:", nombre)
+        if nombre in self._tamanos:
+            self._tamanos[nombre] = fin
+
+    def _truncar(self, ruta, fin):
+        """
+        Deja en `ruta` solo sus primeros `fin` bytes copiándolos a un archivo
+        nuevo. Solo se usa con archivos pequeños (índices y binarios sin CRC).
+        """
+        temporal = ruta + ".tmp"
+        with open(ruta, 'rb') as origen, open(temporal, 'wb') as destino:
+            copiados = 0
+            while copiados < fin:
+                vista = memoryview(self._lectura)[:min(len(self._lectura), fin - copiados)]
+                origen.readinto(vista)
+                destino.write(vista)
+                copiados += len(vista)
+        os.remove(ruta)
+        os.rename(temporal, ruta)
+
+    def _sellar_csv(self, nombre):
+        """
+        Neutraliza la última línea de un CSV si quedó cortada: la convierte en
+        comentario ('#') y la termina, para que los lectores la ignoren y la
+        siguiente escritura empiece en una línea nueva.
+        """
+        with open("{}/{}".format(self.mount_point, nombre), 'r+b') as f:
+            total = f.seek(0, 2)
+            if not total:
+                return
+            pos = max(0, total - len(self._lectura))
+            f.seek(pos)
+            vista = memoryview(self._lectura)[:total - pos]
+            f.readinto(vista)
+            if vista[-1] == 0x0A:
+                return
+            f.seek(pos + bytes(vista).rfind(b'\n') + 1)
+            f.write(b'#')
+            f.seek(total)
+            f.write(b'\n')
+        print("🩹 Línea incompleta comentada en", nombre)
+        if nombre in self._tamanos:
+            self._tamanos[nombre] = total + 1
+
+    def _medir_espacio(self):
+        """
+        Sincroniza la estimación de espacio libre con `statvfs`.
+        """
+        stats = os.statvfs(self.mount_point)
+        self._espacio_total = stats[0] * stats[2]
+        self._espacio_libre = stats[0] * stats[3]
+        self._sin_chequeo = 0
+
+    def _registrar_archivo(self, nombre, tam):
+        """
+        Agrega un archivo a la lista ordenada en memoria.
+        """
+        if nombre in self._tamanos:
+            return
+        self._tamanos[nombre] = tam
+        lista = self._lista_de(nombre)
+        i = len(lista)
+        # Los archivos nuevos suelen ser los más recientes: se inserta desde el final
+        while i > 0 and lista[i - 1] > nombre:
+            i -= 1
+        lista.insert(i, nombre)
+
+    def _eliminar_archivo(self, nombre):
+        """
+        Borra un archivo diario (y su índice) o de resumen y actualiza el
+        estado en memoria.
+
+        Returns:
+            bool: True si se borró.
+        """
+        try:
+            os.remove("{}/{}".format(self.mount_point, nombre))
+            print(f"🗑 Archivo eliminado: {nombre}")
+        except Exception as e:
+            print(f"❌ Error al eliminar {nombre}:", e)
+            return False
+        try:
+            os.remove("{}/{}.idx".format(self.mount_point, nombre))
+        except OSError:
+            pass
+        self._lista_de(nombre).remove(nombre)
+        self._espacio_libre += self._tamanos.pop(nombre, 0)
+        self.generacion += 1
+        self.borrados += 1
+        return True
+
     def get_today_filename(self):
         """
-        Genera el nombre del archivo CSV basado en la fecha actual.
+        Genera el nombre del archivo diario basado en la fecha actual.
 
         Returns:
             str: Ruta completa del archivo del día actual.
         """
         t = time.localtime()
-        return "{}/lecturas_{:04d}-{:02d}-{:02d}.csv".format(
-            self.mount_point, t[0], t[1], t[2]
+        return "{}/lecturas_{:04d}-{:02d}-{:02d}.{}".format(
+            self.mount_point, t[0], t[1], t[2], self.formato
         )
 
     def check_daily_file(self):
         """
-        Verifica si el archivo de hoy existe. Si no, lo crea con encabezados.
+        Verifica si el archivo de hoy existe. Si no, lo crea con encabezados
+        (línea de columnas en CSV o cabecera de `formato_bin`).
         Solo opera si la SD está montada.
         """
         if not self.sd_montada:
             return
-        t = time.localtime()
-        today = t[2]
+        today = tuple(time.localtime()[:3])
         if today != self.current_date:
+            # Lo acumulado pertenece al archivo del día anterior
+            self.flush()
             self.current_date = today
             self.filepath = self.get_today_filename()
             try:
-                with open(self.filepath, "x") as f:
-                    f.write("Hora,Temperatura,Presion,Humedad\n")
+                if self.formato == 'bin':
+                    with open(self.filepath, "xb") as f:
+                        f.write(formato_bin.cabecera(time.gmtime(0)[0]))
+                else:
+                    with open(self.filepath, "x") as f:
+                        f.write(formato_bin.CABECERA_CSV)
                 print(f"[OK] Archivo creado: {self.filepath}")
+                self._bloque_indexado = -1
             except OSError:
                 print(f"[INFO] Archivo ya existe: {self.filepath}")
+                self._bloque_indexado = None
+            try:
+                self._tam_archivo = os.stat(self.filepath)[6]
+            except OSError:
+                self._tam_archivo = 0
+            if self._bloque_indexado is None:
+                self._bloque_indexado = self._tam_archivo // INDICE_CADA_BYTES
+            self._registrar_archivo(self.filepath[len(self.mount_point) + 1:],
+                                    self._tam_archivo)
+            try:
+                self._medir_espacio()
+            except OSError:
+                pass
+            self.aplicar_retencion()
 
     def log_data(self, temperatura, presion, humedad):
         """
-        Registra una línea de datos en el archivo CSV del día.
+        Registra una muestra en el archivo del día.
+
+        En CSV los valores se guardan como números decimales en °C, hPa y %,
+        seguidos del CRC-8 de la línea; en binario, como un registro de 12
+        bytes con los enteros originales y su CRC.
+        La muestra queda en el búfer de escritura hasta el siguiente `flush`.
 
         Args:
-            temperatura (float): Temperatura en °C.
-            presion (float): Presión en hPa.
-            humedad (float): Humedad relativa en %.
+            temperatura (int): Temperatura en centésimas de °C.
+            presion (int): Presión en Pa.
+            humedad (int): Humedad relativa en centésimas de %.
         """
         if not self.sd_montada:
             print("⚠️ SD no disponible, no se puede guardar.")
             return
         self.check_daily_file()
-        self.limpiar_si_espacio_bajo(minimo_porcentaje_libre=0.10)
+        t = time.time()
+        if self.formato == 'bin':
+            datos = None
+            tam = formato_bin.TAM_REGISTRO
+        else:
+            datos = formato_bin.linea_csv(time.localtime(), temperatura, presion,
+                                          humedad).encode()
+            tam = len(datos)
+        if self._pendientes + tam > len(self._buffer) and not self.flush():
+            print("⚠️ Búfer SD lleno, se descarta la muestra.")
+            return
+        if datos is None:
+            formato_bin.empaquetar_en(self._buffer, self._pendientes, t,
+                                      temperatura, presion, humedad)
+        else:
+            self._buffer[self._pendientes:self._pendientes + tam] = datos
+            offset = self._tam_archivo + self._pendientes
+            if offset // INDICE_CADA_BYTES > self._bloque_indexado:
+                self._bloque_indexado = offset // INDICE_CADA_BYTES
+                self._indice_pend.append(struct.pack(INDICE_FORMATO, t, offset))
+        self._pendientes += tam
+        self.generacion += 1
+        self.ultimo_registro[0] = t
+        if t - self._ultimo_flush >= self.flush_intervalo:
+            self.flush()
+
+    def resumir(self, temperatura, presion, humedad):
+        """
+        Incorpora una muestra a los resúmenes por minuto y por hora.
+
+        Puede llamarse con cada lectura del sensor, con más frecuencia que
+        `log_data`: el cálculo es incremental y solo se encola un registro
+        cuando termina un periodo. Los registros se escriben en el siguiente
+        `flush`.
+
+        Args:
+            temperatura (int): Temperatura en centésimas de °C.
+            presion (int): Presión en Pa.
+            humedad (int): Humedad relativa en centésimas de %.
+        """
+        t = time.time()
+        for agregador in self._agregadores:
+            resumen = agregador.agregar(t, temperatura, presion, humedad)
+            if resumen is not None and self.sd_montada:
+                self._resumen_pend.append(
+                    (resumenes.nombre_archivo(agregador.periodo, resumen[0]),
+                     resumenes.empaquetar(resumen)))
+                self.generacion += 1
+                self.ultimo_registro[agregador.periodo] = resumen[0]
+
+    def flush(self):
+        """
+        Escribe en la SD, en una sola operación, los registros acumulados en el búfer.
+
+        Returns:
+            bool: True si no quedan datos pendientes.
+        """
+        self._ultimo_flush = time.time()
+        if not self._pendientes and not self._resumen_pend:
+            return True
+        if not self.sd_montada or (self._pendientes and self.filepath is None):
+            return False
         try:
-            hora = "{:02d}:{:02d}:{:02d}".format(*time.localtime()[3:6])
-            with open(self.filepath, 'a') as f:
-                linea = f"{hora},{temperatura},{presion},{humedad}\n"
-                f.write(linea)
-                print(f"[SD] Datos registrados: {linea.strip()}")
+            if self._pendientes:
+                with open(self.filepath, 'ab') as f:
+                    f.write(memoryview(self._buffer)[:self._pendientes])
+                print("[SD] {} bytes escritos en {}".format(self._pendientes, self.filepath))
+                nombre = self.filepath[len(self.mount_point) + 1:]
+                self._tam_archivo += self._pendientes
+                self._tamanos[nombre] = self._tam_archivo
+                self._espacio_libre -= self._pendientes
+                self._sin_chequeo += self._pendientes
+                self._pendientes = 0
+            if self._indice_pend:
+                with open(self.filepath + ".idx", 'ab') as f:
+                    for entrada in self._indice_pend:
+                        f.write(entrada)
+                self._indice_pend = []
+            if self._resumen_pend:
+                self._escribir_resumenes()
         except Exception as e:
             print("❌ Error escribiendo en SD:", e)
             self.sd_montada = False
+            return False
+        if self._sin_chequeo >= CHEQUEO_CADA_BYTES:
+            try:
+                self._medir_espacio()
+            except OSError:
+                pass
+        self.limpiar_si_espacio_bajo(minimo_porcentaje_libre=self.minimo_libre)
+        return True
+
+    def _escribir_resumenes(self):
+        """
+        Añade los resúmenes terminados a sus archivos, abriendo cada archivo
+        una sola vez por grupo de registros consecutivos.
+        """
+        f = None
+        actual = None
+        try:
+            for nombre, datos in self._resumen_pend:
+                if nombre != actual:
+                    if f:
+                        f.close()
+                    f = open("{}/{}".format(self.mount_point, nombre), 'ab')
+                    actual = nombre
+                    self._registrar_archivo(nombre, 0)
+                f.write(datos)
+                self._tamanos[nombre] += len(datos)
+                self._espacio_libre -= len(datos)
+                self._sin_chequeo += len(datos)
+        finally:
+            if f:
+                f.close()
+        self._resumen_pend = []
+
+    def desmontar(self):
+        """
+        Escribe los datos pendientes y desmonta la SD.
+        """
+        self.flush()
+        try:
+            os.umount(self.mount_point)
+        except Exception:
+            pass
+        self.sd_montada = False
 
     def leer_ultimo_dato(self):
         """
-        Lee la última línea de datos registrada en el archivo actual.
+        Lee el último registro guardado en la SD.
+
+        Solo lee: no crea ni abre el archivo del día, que puede no corresponder
+        aún a la fecha real si el reloj no está sincronizado.
 
         Returns:
-            str or None: Última línea de datos, o `None` si no hay datos disponibles.
+            tuple or None: (t, temperatura, presion, humedad), o `None` si no hay
+            datos disponibles.
         """
         if not self.sd_montada:
             self.intentar_reconexion()
         if not self.sd_montada:
             return None
-        self.check_daily_file()
         try:
-            with open(self.filepath, 'r') as f:
-                lines = f.readlines()
-                if len(lines) > 1:
-                    return lines[-1].strip()
+            ultimos = self.leer_ultimos(1)
+            if ultimos:
+                return ultimos[0]
         except Exception as e:
             print("Error leyendo último dato:", e)
             self.sd_montada = False
         return None
 
+    def archivos_registro(self):
+        """
+        Lista los archivos diarios de la SD, del más antiguo al más reciente,
+        a partir de la lista mantenida en memoria (sin recorrer el directorio).
+
+        Returns:
+            list: Nombres de archivo (sin el punto de montaje).
+        """
+        return list(self._archivos)
+
+    def leer_ultimos(self, n):
+        """
+        Lee los últimos `n` registros, empezando por los que aún están en el
+        búfer y recorriendo después los archivos desde el final.
+
+        Cada archivo se lee hacia atrás en bloques con un búfer reutilizable,
+        así que la memoria y el tiempo dependen de `n` y no del tamaño de los
+        archivos.
+
+        Args:
+            n (int): Número de registros a leer.
+
+        Returns:
+            list: Tuplas (t, temperatura, presion, humedad) en orden cronológico.
+        """
+        registros = []
+        if not self.sd_montada or n <= 0:
+            return registros
+        for registro in reversed(list(self._registros_pendientes())):
+            registros.append(registro)
+            if len(registros) >= n:
+                registros.reverse()
+                return registros
+        for nombre in reversed(self.archivos_registro()):
+            ruta = "{}/{}".format(self.mount_point, nombre)
+            if nombre.endswith(".bin"):
+                cola = self._cola_bin(ruta)
+            else:
+                cola = self._cola_csv(ruta, epoch_del_archivo(nombre))
+            for registro in cola:
+                registros.append(registro)
+                if len(registros) >= n:
+                    break
+            if len(registros) >= n:
+                break
+        registros.reverse()
+        return registros
+
+    def _registros_pendientes(self):
+        """
+        Recorre los registros crudos que aún esperan en el búfer de escritura,
+        del más antiguo al más reciente. Son siempre posteriores a los del
+        archivo del día.
+        """
+        if not self._pendientes or self.filepath is None:
+            return
+        if self.formato == 'bin':
+            for offset in range(0, self._pendientes, formato_bin.TAM_REGISTRO):
+                yield formato_bin.desempaquetar(self._buffer, offset)
+            return
+        base = epoch_del_archivo(self.filepath[len(self.mount_point) + 1:])
+        for linea in bytes(self._buffer[:self._pendientes]).decode().split('\n'):
+            registro = parsear_linea(linea, base)
+            if registro is not None:
+                yield registro
+
+    def _resumenes_pendientes(self, resolucion):
+        """
+        Recorre los resúmenes de un nivel que aún no se escribieron, del más
+        antiguo al más reciente, con la forma de `resumenes.desempaquetar_media`.
+        """
+        for nombre, datos in self._resumen_pend:
+            if resumenes.periodo_de(nombre) == resolucion:
+                yield resumenes.desempaquetar_media(datos)
+
+    def _cola_bin(self, ruta):
+        """
+        Recorre los registros válidos de un archivo binario del más reciente al
+        más antiguo.
+        """
+        tam = formato_bin.TAM_REGISTRO
+        por_bloque = len(self._lectura) // tam
+        with open(ruta, 'rb') as f:
+            valido = validador_bin(f)
+            fin = (f.seek(0, 2) - formato_bin.TAM_CABECERA) // tam
+            while fin > 0:
+                inicio = max(0, fin - por_bloque)
+                f.seek(formato_bin.desplazamiento(inicio))
+                f.readinto(memoryview(self._lectura)[:(fin - inicio) * tam])
+                for i in range(fin - inicio - 1, -1, -1):
+                    if valido is None or valido(self._lectura, i * tam):
+                        yield formato_bin.desempaquetar(self._lectura, i * tam)
+                fin = inicio
+
+    def _cola_csv(self, ruta, base):
+        """
+        Recorre las líneas de un CSV de la más reciente a la más antigua.
+        """
+        with open(ruta, 'rb') as f:
+            pos = f.seek(0, 2)
+            resto = b''
+            while pos > 0:
+                tam = min(len(self._lectura), pos)
+                pos -= tam
+                f.seek(pos)
+                vista = memoryview(self._lectura)[:tam]
+                f.readinto(vista)
+                lineas = (bytes(vista) + resto).split(b'\n')
+                # La primera puede estar cortada; se completa con el bloque anterior
+                resto = lineas[0]
+                for i in range(len(lineas) - 1, 0, -1):
+                    registro = parsear_linea(lineas[i].decode(), base)
+                    if registro is not None:
+                        yield registro
+            registro = parsear_linea(resto.decode(), base)
+            if registro is not None:
+                yield registro
+
+    def elegir_resolucion(self, inicio, fin):
+        """
+        Elige el nivel de datos adecuado para el rango [inicio, fin].
+
+        Usa registros crudos para rangos cortos que aún conservan datos crudos,
+        resúmenes por minuto hasta `RANGO_MAX_MINUTOS` y horarios para el resto.
+
+        Returns:
+            int: 0 para registros crudos, o el periodo del resumen en segundos.
+        """
+        duracion = fin - inicio
+        if (duracion <= RANGO_MAX_CRUDO and self._archivos
+                and epoch_del_archivo(self._archivos[0]) <= inicio):
+            return 0
+        minutos = self._resumenes[resumenes.MINUTO]
+        if (duracion <= RANGO_MAX_MINUTOS and minutos
+                and resumenes.rango_archivo(minutos[0])[0] <= inicio):
+            return resumenes.MINUTO
+        return resumenes.HORA
+
+    def query(self, inicio, fin, limite=None, resolucion=None):
+        """
+        Devuelve los registros con marca de tiempo entre `inicio` y `fin`.
+
+        Solo abre los archivos que se solapan con el rango. En los binarios
+        localiza el primer registro por búsqueda binaria sobre el archivo; en
+        los CSV salta con el índice `.idx` al bloque adecuado. En ambos casos
+        se leen unos pocos bloques en lugar del archivo completo. Los registros
+        que aún están en el búfer se añaden al final sin escribirlos.
+
+        Con resúmenes, cada registro es la media del periodo y su marca de
+        tiempo es el inicio del periodo.
+
+        Args:
+            inicio (int): Epoch inicial (incluido).
+            fin (int): Epoch final (incluido).
+            limite (int, optional): Número máximo de registros a devolver.
+            resolucion (int, optional): 0 para registros crudos, `resumenes.MINUTO`
+                o `resumenes.HORA`. Por defecto se elige con `elegir_resolucion`.
+
+        Returns:
+            list: Tuplas (t, temperatura, presion, humedad) en orden cronológico.
+        """
+        resultado = []
+        if not self.sd_montada:
+            return resultado
+        if resolucion is None:
+            resolucion = self.elegir_resolucion(inicio, fin)
+        if resolucion:
+            for nombre in list(self._resumenes[resolucion]):
+                desde, hasta = resumenes.rango_archivo(nombre)
+                if hasta <= inicio or desde > fin:
+                    continue
+                with open("{}/{}".format(self.mount_point, nombre), 'rb') as f:
+                    for registro in self._rango_fijo(f, 0, resumenes.TAM_RESUMEN,
+                                                     resumenes.desempaquetar_media,
+                                                     resumenes.valido, inicio, fin):
+                        resultado.append(registro)
+                        if limite and len(resultado) >= limite:
+                            return resultado
+            pendientes = self._resumenes_pendientes(resolucion)
+        else:
+            for nombre in self.archivos_registro():
+                base = epoch_del_archivo(nombre)
+                if base + 86400 <= inicio or base > fin:
+                    continue
+                ruta = "{}/{}".format(self.mount_point, nombre)
+                if nombre.endswith(".bin"):
+                    registros = self._rango_bin(ruta, inicio, fin)
+                else:
+                    registros = self._rango_csv(ruta, base, inicio, fin)
+                for registro in registros:
+                    resultado.append(registro)
+                    if limite and len(resultado) >= limite:
+                        return resultado
+            pendientes = self._registros_pendientes()
+        for registro in pendientes:
+            if registro[0] > fin or (limite and len(resultado) >= limite):
+                break
+            if registro[0] >= inicio:
+                resultado.append(registro)
+        return resultado
+
+    def _rango_bin(self, ruta, inicio, fin):
+        """
+        Recorre los registros de un archivo diario binario en [inicio, fin].
+        """
+        with open(ruta, 'rb') as f:
+            yield from self._rango_fijo(f, formato_bin.TAM_CABECERA,
+                                        formato_bin.TAM_REGISTRO,
+                                        formato_bin.desempaquetar,
+                                        validador_bin(f), inicio, fin)
+
+    def _rango_fijo(self, f, cabecera, tam, desempaquetar, valido, inicio, fin):
+        """
+        Recorre los registros de ancho fijo de un archivo binario en [inicio, fin].
+
+        Args:
+            f: Archivo abierto en modo 'rb'.
+            cabecera (int): Bytes de cabecera antes del primer registro.
+            tam (int): Tamaño de cada registro.
+            desempaquetar: Función (buf, offset) -> tupla con el tiempo primero.
+            valido: Función (buf, offset) -> bool, o None si no hay CRC.
+        """
+        bloque = bytearray(tam * 16)
+        n = (f.seek(0, 2) - cabecera) // tam
+        # Búsqueda binaria del primer registro con t >= inicio
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(cabecera + mid * tam)
+            f.readinto(bloque)
+            if desempaquetar(bloque, 0)[0] < inicio:
+                lo = mid + 1
+            else:
+                hi = mid
+        f.seek(cabecera + lo * tam)
+        while True:
+            leidos = f.readinto(bloque) // tam
+            if not leidos:
+                return
+            for i in range(leidos):
+                if valido is not None and not valido(bloque, i * tam):
+                    continue
+                registro = desempaquetar(bloque, i * tam)
+                if registro[0] > fin:
+                    return
+                yield registro
+
+    def _rango_csv(self, ruta, base, inicio, fin):
+        """
+        Recorre las líneas de un CSV en [inicio, fin] usando su índice disperso.
+        """
+        offset = 0
+        entrada = bytearray(TAM_INDICE)
+        try:
+            with open(ruta + ".idx", 'rb') as f:
+                # Última entrada anterior a `inicio`, por búsqueda binaria sobre
+                # el archivo: se leen unas pocas entradas y no el índice entero
+                lo, hi = 0, f.seek(0, 2) // TAM_INDICE
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    f.seek(mid * TAM_INDICE)
+                    f.readinto(entrada)
+                    if struct.unpack_from(INDICE_FORMATO, entrada)[0] < inicio:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                if lo:
+                    f.seek((lo - 1) * TAM_INDICE)
+                    f.readinto(entrada)
+                    offset = struct.unpack_from(INDICE_FORMATO, entrada)[1]
+        except OSError:
+            pass
+        with open(ruta, 'r') as f:
+            f.seek(offset)
+            while True:
+                linea = f.readline()
+                if not linea:
+                    return
+                registro = parsear_linea(linea, base)
+                if registro is None or registro[0] < inicio:
+                    continue
+                if registro[0] > fin:
+                    return
+                yield registro
+
     def intentar_reconexion(self):
         """
         Intenta montar nuevamente la SD si no está montada.
@@ -150,45 +933,64 @@ class SDLogger:
             print("🔄 Intentando reconectar SD...")
             self.init_sd()
 
+    def aplicar_retencion(self):
+        """
+        Aplica la política de retención: borra los archivos crudos más antiguos
+        que `retencion_dias` y los resúmenes por minuto más antiguos que
+        `retencion_minutos_dias`, luego los crudos más antiguos mientras el
+        total de los crudos supere `retencion_bytes`, y finalmente comprueba el espacio libre
+        mínimo. Nunca borra el archivo del día actual.
+        """
+        actual = self.filepath[len(self.mount_point) + 1:] if self.filepath else None
+        if self.retencion_dias is not None:
+            limite = time.time() - self.retencion_dias * 86400
+            while (self._archivos and self._archivos[0] != actual
+                   and epoch_del_archivo(self._archivos[0]) + 86400 <= limite):
+                if not self._eliminar_archivo(self._archivos[0]):
+                    break
+        if self.retencion_minutos_dias is not None:
+            limite = time.time() - self.retencion_minutos_dias * 86400
+            minutos = self._resumenes[resumenes.MINUTO]
+            while minutos and resumenes.rango_archivo(minutos[0])[1] <= limite:
+                if not self._eliminar_archivo(minutos[0]):
+                    break
+        if self.retencion_bytes is not None:
+            # El límite es solo para los registros crudos, los únicos que se
+            # borran aquí; los resúmenes tienen su propia retención
+            total = 0
+            for nombre in self._archivos:
+                total += self._tamanos.get(nombre, 0)
+            while (total > self.retencion_bytes and self._archivos
+                   and self._archivos[0] != actual):
+                tam = self._tamanos.get(self._archivos[0], 0)
+                if not self._eliminar_archivo(self._archivos[0]):
+                    break
+                total -= tam
+        self.limpiar_si_espacio_bajo(minimo_porcentaje_libre=self.minimo_libre)
+
     def limpiar_si_espacio_bajo(self, minimo_porcentaje_libre=0.10):
         """
         Elimina archivos antiguos si el espacio libre en la SD es menor al umbral dado.
 
+        Usa la estimación incremental de espacio libre y la lista ordenada de
+        archivos en memoria, sin consultar `statvfs` ni listar el directorio.
+        Borra primero los registros crudos y después los resúmenes por minuto
+        más antiguos; conserva el archivo del día, el del mes y los horarios.
+
         Args:
             minimo_porcentaje_libre (float): Porcentaje mínimo requerido de espacio libre.
         """
-        try:
-            stats = os.statvfs(self.mount_point)
-            espacio_total = stats[0] * stats[2]
-            espacio_libre = stats[0] * stats[3]
-            porcentaje_libre = espacio_libre / espacio_total
-            print(f"Bloque: {stats[0]}, Total bloques: {stats[2]}, Libres: {stats[3]}")
-            print(f"Espacio total: {espacio_total / 1024:.2f} KB")
-            print(f"Espacio libre: {espacio_libre / 1024:.2f} KB")
-            print(f"[SD] Espacio libre: {porcentaje_libre:.2%}")
-
-            while porcentaje_libre < minimo_porcentaje_libre:
-                archivos = [
-                    f for f in os.listdir(self.mount_point)
-                    if f.startswith("lecturas_") and f.endswith(".csv")
-                ]
-                if not archivos:
-                    print("ℹ️ No hay archivos para borrar.")
-                    return
-
-                archivos.sort()  # más antiguo al principio
-                archivo_mas_antiguo = archivos[0]
-                try:
-                    os.remove(f"{self.mount_point}/{archivo_mas_antiguo}")
-                    print(f"🗑 Archivo eliminado: {archivo_mas_antiguo}")
-                except Exception as e:
-                    print(f"❌ Error al eliminar {archivo_mas_antiguo}:", e)
-                    break
-
-                # Recalcular espacio
-                stats = os.statvfs(self.mount_point)
-                espacio_total = stats[0] * stats[2]
-                espacio_libre = stats[0] * stats[3]
-                porcentaje_libre = espacio_libre / espacio_total
-        except Exception as e:
-            print("❌ Error al comprobar espacio en SD:", e)
+        if not self._espacio_total:
+            return
+        actual = self.filepath[len(self.mount_point) + 1:] if self.filepath else None
+        minutos = self._resumenes[resumenes.MINUTO]
+        while self._espacio_libre < minimo_porcentaje_libre * self._espacio_total:
+            if self._archivos and self._archivos[0] != actual:
+                nombre = self._archivos[0]
+            elif len(minutos) > 1:
+                nombre = minutos[0]
+            else:
+                print("ℹ️ No hay archivos para borrar.")
+                return
+            if not self._eliminar_archivo(nombre):
+                return
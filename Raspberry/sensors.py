@@ -1,5 +1,9 @@
 from machine import I2C
+import struct
 import time
+import uasyncio as asyncio
+
+from unidades import formatear_centi
 
 # ADDR
 BME280_I2CADDR = 0x76
@@ -11,6 +15,43 @@ BME280_OSAMPLE_4 = 3
 BME280_OSAMPLE_8 = 4
 BME280_OSAMPLE_16 = 5
 
+# Modos de medición (bits mode de ctrl_meas)
+BME280_SLEEP_MODE = 0
+BME280_FORCED_MODE = 1
+BME280_NORMAL_MODE = 3
+
+# Tiempo de reposo entre mediciones en modo normal (t_sb de config)
+BME280_STANDBY_0_5 = 0
+BME280_STANDBY_62_5 = 1
+BME280_STANDBY_125 = 2
+BME280_STANDBY_250 = 3
+BME280_STANDBY_500 = 4
+BME280_STANDBY_1000 = 5
+BME280_STANDBY_10 = 6
+BME280_STANDBY_20 = 7
+
+# Coeficiente del filtro IIR (filter de config)
+BME280_FILTER_OFF = 0
+BME280_FILTER_2 = 1
+BME280_FILTER_4 = 2
+BME280_FILTER_8 = 3
+BME280_FILTER_16 = 4
+
+# Perfiles de muestreo en modo normal:
+# (sobremuestreo T, sobremuestreo P, sobremuestreo H, filtro IIR, t_standby)
+BME280_PROFILES = {
+    # Estación meteorológica: mínimo consumo, un dato por segundo
+    'weather': (BME280_OSAMPLE_1, BME280_OSAMPLE_1, BME280_OSAMPLE_1,
+                BME280_FILTER_OFF, BME280_STANDBY_1000),
+    # Interior: presión con alta resolución y filtrada contra corrientes de aire
+    'indoor': (BME280_OSAMPLE_2, BME280_OSAMPLE_16, BME280_OSAMPLE_1,
+               BME280_FILTER_16, BME280_STANDBY_125),
+    # Alta frecuencia: ~60-70 Hz (14-16 ms de conversión + 0,5 ms de espera)
+    # con filtro ligero
+    'high_rate': (BME280_OSAMPLE_1, BME280_OSAMPLE_4, BME280_OSAMPLE_1,
+                  BME280_FILTER_4, BME280_STANDBY_0_5),
+}
+
 # Registros
 
 BME280_REGISTER_DIG_T1 = 0x88 
@@ -35,17 +76,54 @@ BME280_REGISTER_DIG_H5 = 0xE5
 BME280_REGISTER_DIG_H6 = 0xE6
 BME280_REGISTER_DIG_H7 = 0xE7
 
+# Bloques de calibración: 0x88..0xA1 (T, P y H1) y 0xE1..0xE7 (H2..H6)
+BME280_CALIB_TP_SIZE = 26
+BME280_CALIB_H_SIZE = 7
+BME280_CALIB_TP_FORMAT = '<HhhHhhhhhhhhBB'
+BME280_CALIB_H_FORMAT = '<hBbBbb'
+BME280_CALIB_CACHE_MAGIC = b'BMEC'
+# Bytes de dig_T1..dig_T3 que se releen para comprobar que la caché es de este módulo
+BME280_CALIB_CHECK_SIZE = 6
+
 BME280_REGISTER_CHIPID = 0xD0
 BME280_REGISTER_VERSION = 0xD1
 BME280_REGISTER_SOFTRESET = 0xE0
 
 BME280_REGISTER_CONTROL_HUM = 0xF2
+BME280_REGISTER_STATUS = 0xF3
 BME280_REGISTER_CONTROL = 0xF4
 BME280_REGISTER_CONFIG = 0xF5
 BME280_REGISTER_PRESSURE_DATA = 0xF7
 BME280_REGISTER_TEMP_DATA = 0xFA
 BME280_REGISTER_HUMIDITY_DATA = 0xFD
 
+def format_temperature(t):
+    """
+    Formatea una temperatura en centésimas de grado Celsius.
+
+    Returns:
+        str: Temperatura (por ejemplo, '24.13C').
+    """
+    return formatear_centi(t) + "C"
+
+def format_pressure(p):
+    """
+    Formatea una presión en Pa como hPa.
+
+    Returns:
+        str: Presión (por ejemplo, '1013.25hPa').
+    """
+    return formatear_centi(p) + "hPa"
+
+def format_humidity(h):
+    """
+    Formatea una humedad en centésimas de porcentaje.
+
+    Returns:
+        str: Humedad (por ejemplo, '48.32%').
+    """
+    return formatear_centi(h) + "%"
+
 class Device:
     """
     Clase auxiliar para manejar la comunicación con un dispositivo I2C.
@@ -61,8 +139,8 @@ class Device:
         """
             Crea la instancia I2C de un dispositivo en una ADDR especificada
         """
-        self.i2c = i2c
-        self.address = address
+        self._i2c = i2c
+        self._address = address
         self.calib_params = {}
 
     def writeRaw8(self, value):
@@ -88,7 +166,7 @@ class Device:
         b=bytearray(2)
         b[0]= value & 0xFF
         b[1]= (value>>8) & 0xFF
-        self.i2c.writeto_mem(self._address, register, value)
+        self._i2c.writeto_mem(self._address, register, b)
 
     def readRaw8(self):
         """
@@ -103,6 +181,20 @@ class Device:
         return int.from_bytes(
             self._i2c.readfrom_mem(self._address, register, 1),'little') & 0xFF
 
+    def readInto(self, register, buf):
+        """
+        Lee un bloque de registros consecutivos en una sola transacción I2C.
+
+        Args:
+            register (int): Registro inicial.
+            buf (bytearray): Búfer destino; se leen `len(buf)` bytes.
+
+        Returns:
+            bytearray: El mismo búfer recibido, ya rellenado.
+        """
+        self._i2c.readfrom_mem_into(self._address, register, buf)
+        return buf
+
     def readS8(self, register):
         """
         Lee un byte con signo desde un registro del dispositivo.
@@ -163,9 +255,13 @@ class BME280:
         mode (int): Modo de sobremuestreo. Valores válidos: 1 a 5.
         address (int): Dirección I2C del sensor. Por defecto 0x76.
         i2c (I2C): Objeto I2C de MicroPython.
+        calib_cache (str, optional): Ruta en flash donde guardar la calibración
+            para que los reinicios no la vuelvan a leer del bus.
+        profile (str, optional): Perfil de `BME280_PROFILES` para trabajar en
+            modo normal. Si es None se usa modo forzado con `mode`.
     """
     def __init__(self, mode=BME280_OSAMPLE_1, address=BME280_I2CADDR, i2c=None,
-                **kwargs):
+                calib_cache=None, profile=None, **kwargs):
         # Verifica el modo
         if mode not in [BME280_OSAMPLE_1, BME280_OSAMPLE_2, BME280_OSAMPLE_4,
                         BME280_OSAMPLE_8, BME280_OSAMPLE_16]:
@@ -174,47 +270,180 @@ class BME280:
                 'BME280_ULTRALOWPOWER, BME280_STANDARD, BME280_HIGHRES, or '
                 'BME280_ULTRAHIGHRES'.format(mode))
         self._mode = mode
+        self._osrs_t = self._osrs_p = self._osrs_h = mode
+        self._normal = False
+        self._ready_ms = 0
         # Crea dispositivo I2C
         if i2c is None:
             raise ValueError('An I2C object is required.')
-        self._device = Device(address, i2c)
+        self._device = Device(i2c, address)
+        self._address = address
+        # Búfer reutilizable para la lectura en ráfaga de 0xF7..0xFE
+        self._data = bytearray(8)
         # Carga valores de calibracion 
-        self._load_calibration()
+        self._load_calibration(calib_cache)
+        # ctrl_hum solo se aplica al escribir ctrl_meas, basta con fijarlo una vez
+        self._device.write8(BME280_REGISTER_CONTROL_HUM, self._mode)
         self._device.write8(BME280_REGISTER_CONTROL, 0x3F)
         self.t_fine = 0
+        if profile is not None:
+            self.set_profile(profile)
 
-    def _load_calibration(self):
+    def set_profile(self, profile):
+        """
+        Configura el sensor en modo normal según un perfil de muestreo.
+
+        En modo normal el sensor mide de forma continua con el t_standby y el
+        filtro IIR del perfil, y las lecturas se reducen a una ráfaga de
+        registros sin esperar conversión. Con `profile=None` se vuelve al modo
+        forzado con el sobremuestreo `mode` del constructor.
+
+        Args:
+            profile (str or None): Clave de `BME280_PROFILES`.
+
+        Raises:
+            ValueError: Si el perfil no existe.
+        """
+        if profile is None:
+            self._osrs_t = self._osrs_p = self._osrs_h = self._mode
+            iir, standby = BME280_FILTER_OFF, BME280_STANDBY_0_5
+        elif profile in BME280_PROFILES:
+            (self._osrs_t, self._osrs_p, self._osrs_h,
+             iir, standby) = BME280_PROFILES[profile]
+        else:
+            raise ValueError(
+                'Unexpected profile {0}. Set profile to one of {1} or None'.format(
+                    profile, ', '.join(BME280_PROFILES)))
+        meas = self._osrs_t << 5 | self._osrs_p << 2
+        # config solo se escribe de forma fiable con el sensor en modo sleep
+        self._device.write8(BME280_REGISTER_CONTROL, meas | BME280_SLEEP_MODE)
+        self._device.write8(BME280_REGISTER_CONFIG, standby << 5 | iir << 2)
+        self._device.write8(BME280_REGISTER_CONTROL_HUM, self._osrs_h)
+        self._normal = profile is not None
+        if self._normal:
+            self._device.write8(BME280_REGISTER_CONTROL, meas | BME280_NORMAL_MODE)
+            # La primera conversión aún no está en los registros de datos
+            self._ready_ms = time.ticks_add(
+                time.ticks_ms(), (self._conversion_time_us() + 999) // 1000)
+
+    def _load_calibration(self, cache=None):
         """
         Carga los parámetros de calibración desde los registros internos del BME280.
         Esta información es necesaria para compensar las mediciones crudas.
+
+        Lee los dos bloques de calibración con dos lecturas en ráfaga. Si se
+        indica `cache` y el archivo corresponde al mismo chip y dirección, se
+        usa el contenido guardado y del bus solo se leen los coeficientes de
+        temperatura para confirmar que no se cambió el módulo.
+
+        Args:
+            cache (str, optional): Ruta del archivo de caché de calibración.
+        """
+        chip_id = self._device.readU8(BME280_REGISTER_CHIPID)
+        raw = bytearray(BME280_CALIB_TP_SIZE + BME280_CALIB_H_SIZE)
+        if not (cache and self._read_calibration_cache(cache, chip_id, raw)):
+            mv = memoryview(raw)
+            self._device.readInto(BME280_REGISTER_DIG_T1, mv[:BME280_CALIB_TP_SIZE])
+            self._device.readInto(BME280_REGISTER_DIG_H2, mv[BME280_CALIB_TP_SIZE:])
+            if cache:
+                self._write_calibration_cache(cache, chip_id, raw)
+        self._unpack_calibration(raw)
+
+    def _unpack_calibration(self, raw):
+        """
+        Decodifica los bloques crudos de calibración.
+
+        Args:
+            raw (bytearray): Contenido de 0x88..0xA1 seguido de 0xE1..0xE7.
+        """
+        (self.dig_T1, self.dig_T2, self.dig_T3,
+         self.dig_P1, self.dig_P2, self.dig_P3, self.dig_P4, self.dig_P5,
+         self.dig_P6, self.dig_P7, self.dig_P8, self.dig_P9,
+         _, self.dig_H1) = struct.unpack_from(BME280_CALIB_TP_FORMAT, raw, 0)
+        (self.dig_H2, self.dig_H3, e4, e5, e6,
+         self.dig_H6) = struct.unpack_from(BME280_CALIB_H_FORMAT, raw,
+                                           BME280_CALIB_TP_SIZE)
+        self.dig_H4 = (e4 << 4) | (e5 & 0x0F)
+        self.dig_H5 = (e6 << 4) | (e5 >> 4)
+
+    def _read_calibration_cache(self, path, chip_id, raw):
+        """
+        Rellena `raw` con la calibración guardada en flash.
+
+        Returns:
+            bool: True si el archivo existe, pertenece a este chip y dirección y
+            sus coeficientes de temperatura coinciden con los del sensor.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return False
+        header = BME280_CALIB_CACHE_MAGIC + bytes((chip_id, self._address))
+        if len(data) != len(header) + len(raw) or data[:len(header)] != header:
+            return False
+        # Otro BME280 en la misma dirección tiene el mismo chip_id pero otra calibración
+        check = self._device.readInto(BME280_REGISTER_DIG_T1,
+                                      bytearray(BME280_CALIB_CHECK_SIZE))
+        if data[len(header):len(header) + BME280_CALIB_CHECK_SIZE] != check:
+            return False
+        raw[:] = data[len(header):]
+        return True
+
+    def _write_calibration_cache(self, path, chip_id, raw):
+        """
+        Guarda la calibración en flash para los siguientes arranques.
+        """
+        try:
+            with open(path, 'wb') as f:
+                f.write(BME280_CALIB_CACHE_MAGIC)
+                f.write(bytes((chip_id, self._address)))
+                f.write(raw)
+        except OSError:
+            pass
+
+    def _start_forced(self):
+        """
+        Dispara una conversión en modo forzado con el sobremuestreo configurado.
+        """
+        meas = self._osrs_t << 5 | self._osrs_p << 2 | BME280_FORCED_MODE
+        self._device.write8(BME280_REGISTER_CONTROL, meas)
+
+    def _conversion_time_us(self, typical=False):
         """
-        self.dig_T1 = self._device.readU16LE(BME280_REGISTER_DIG_T1)
-        self.dig_T2 = self._device.readS16LE(BME280_REGISTER_DIG_T2)
-        self.dig_T3 = self._device.readS16LE(BME280_REGISTER_DIG_T3)
-
-        self.dig_P1 = self._device.readU16LE(BME280_REGISTER_DIG_P1)
-        self.dig_P2 = self._device.readS16LE(BME280_REGISTER_DIG_P2)
-        self.dig_P3 = self._device.readS16LE(BME280_REGISTER_DIG_P3)
-        self.dig_P4 = self._device.readS16LE(BME280_REGISTER_DIG_P4)
-        self.dig_P5 = self._device.readS16LE(BME280_REGISTER_DIG_P5)
-        self.dig_P6 = self._device.readS16LE(BME280_REGISTER_DIG_P6)
-        self.dig_P7 = self._device.readS16LE(BME280_REGISTER_DIG_P7)
-        self.dig_P8 = self._device.readS16LE(BME280_REGISTER_DIG_P8)
-        self.dig_P9 = self._device.readS16LE(BME280_REGISTER_DIG_P9)
-
-        self.dig_H1 = self._device.readU8(BME280_REGISTER_DIG_H1)
-        self.dig_H2 = self._device.readS16LE(BME280_REGISTER_DIG_H2)
-        self.dig_H3 = self._device.readU8(BME280_REGISTER_DIG_H3)
-        self.dig_H6 = self._device.readS8(BME280_REGISTER_DIG_H7)
-
-        h4 = self._device.readS8(BME280_REGISTER_DIG_H4)
-        h4 = (h4 << 24) >> 20
-        self.dig_H4 = h4 | (self._device.readU8(BME280_REGISTER_DIG_H5) & 0x0F)
-
-        h5 = self._device.readS8(BME280_REGISTER_DIG_H6)
-        h5 = (h5 << 24) >> 20
-        self.dig_H5 = h5 | (
-            self._device.readU8(BME280_REGISTER_DIG_H5) >> 4 & 0x0F)
+        Calcula el tiempo de una conversión (temperatura, presión y humedad).
+
+        Args:
+            typical (bool): Si es True usa los tiempos típicos del datasheet
+                en lugar de los máximos.
+
+        Returns:
+            int: Tiempo de espera en microsegundos.
+        """
+        if typical:
+            base, step, extra = 1000, 2000, 500
+        else:
+            base, step, extra = 1250, 2300, 575
+        # El registro vale 0 (canal omitido) o 1..5 para x1..x16
+        t = (1 << (self._osrs_t - 1)) if self._osrs_t else 0
+        p = (1 << (self._osrs_p - 1)) if self._osrs_p else 0
+        h = (1 << (self._osrs_h - 1)) if self._osrs_h else 0
+        sleep_time = base + step * t
+        sleep_time = sleep_time + step * p + extra
+        sleep_time = sleep_time + step * h + extra
+        return sleep_time
+
+    def _wait_first_sample_ms(self):
+        """
+        En modo normal, milisegundos que faltan para la primera conversión.
+        """
+        return max(0, time.ticks_diff(self._ready_ms, time.ticks_ms()))
+
+    def _measuring(self):
+        """
+        Indica si el sensor sigue convirtiendo (bit `measuring` de 0xF3).
+        """
+        return self._device.readU8(BME280_REGISTER_STATUS) & 0x08
 
     def read_raw_temp(self):
         """
@@ -223,15 +452,13 @@ class BME280:
             Returns:
                 int: Valor ADC crudo de temperatura.
         """        
-        meas = self._mode
-        self._device.write8(BME280_REGISTER_CONTROL_HUM, meas)
-        meas = self._mode << 5 | self._mode << 2 | 1
-        self._device.write8(BME280_REGISTER_CONTROL, meas)
-        sleep_time = 1250 + 2300 * (1 << self._mode)
-
-        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
-        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
-        time.sleep_us(sleep_time) 
+        if self._normal:
+            time.sleep_ms(self._wait_first_sample_ms())
+        else:
+            meas = self._osrs_h
+            self._device.write8(BME280_REGISTER_CONTROL_HUM, meas)
+            self._start_forced()
+            time.sleep_us(self._conversion_time_us())
         msb = self._device.readU8(BME280_REGISTER_TEMP_DATA)
         lsb = self._device.readU8(BME280_REGISTER_TEMP_DATA + 1)
         xlsb = self._device.readU8(BME280_REGISTER_TEMP_DATA + 2)
@@ -272,8 +499,19 @@ class BME280:
         Returns:
             int: Temperatura en centésimas de grado Celsius (por ejemplo, 2500 = 25.00°C).
         """
-        adc = self.read_raw_temp()
-        var1 = ((adc >> 3) - (self.dig_T1 << 1)) * (self.dig_T2 >> 11)
+        return self._compensate_temperature(self.read_raw_temp())
+
+    def _compensate_temperature(self, adc):
+        """
+        Aplica la compensación de temperatura y actualiza `t_fine`.
+
+        Args:
+            adc (int): Valor ADC crudo de temperatura.
+
+        Returns:
+            int: Temperatura en centésimas de grado Celsius.
+        """
+        var1 = (((adc >> 3) - (self.dig_T1 << 1)) * self.dig_T2) >> 11
         var2 = ((
             (((adc >> 4) - self.dig_T1) * ((adc >> 4) - self.dig_T1)) >> 12) *
             self.dig_T3) >> 14
@@ -287,13 +525,24 @@ class BME280:
         Returns:
             int: Presión en Pa.
         """
-        adc = self.read_raw_pressure()
+        return self._compensate_pressure(self.read_raw_pressure())
+
+    def _compensate_pressure(self, adc):
+        """
+        Aplica la compensación de presión. Requiere `t_fine` actualizado.
+
+        Args:
+            adc (int): Valor ADC crudo de presión.
+
+        Returns:
+            int: Presión en Pa en formato Q24.8 (valor / 256 = Pa).
+        """
         var1 = self.t_fine - 128000
         var2 = var1 * var1 * self.dig_P6
         var2 = var2 + ((var1 * self.dig_P5) << 17)
         var2 = var2 + (self.dig_P4 << 35)
         var1 = (((var1 * var1 * self.dig_P3) >> 8) +
-                ((var1 * self.dig_P2) >> 12))
+                ((var1 * self.dig_P2) << 12))
         var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
         if var1 == 0:
             return 0
@@ -310,7 +559,18 @@ class BME280:
         Returns:
             int: Humedad en milésimas de porcentaje (por ejemplo, 48000 = 48.00%).
         """
-        adc = self.read_raw_humidity()
+        return self._compensate_humidity(self.read_raw_humidity())
+
+    def _compensate_humidity(self, adc):
+        """
+        Aplica la compensación de humedad. Requiere `t_fine` actualizado.
+
+        Args:
+            adc (int): Valor ADC crudo de humedad.
+
+        Returns:
+            int: Humedad relativa en formato Q22.10 (valor / 1024 = %).
+        """
         h = self.t_fine - 76800
         h = (((((adc << 14) - (self.dig_H4 << 20) - (self.dig_H5 * h)) +
             16384) >> 15) * (((((((h * self.dig_H6) >> 10) * (((h *
@@ -321,6 +581,70 @@ class BME280:
         h = 419430400 if h > 419430400 else h
         return h >> 12
 
+    def read_all(self):
+        """
+        Realiza una única conversión forzada y lee los tres canales en una sola
+        ráfaga I2C de 8 bytes (registros 0xF7 a 0xFE). En modo normal (con un
+        perfil activo) solo se hace la ráfaga, sin esperar conversión.
+
+        Returns:
+            tuple: (temperatura, presion, humedad) como enteros en centésimas de
+            grado Celsius, Pa y centésimas de porcentaje respectivamente
+            (por ejemplo, (2413, 101325, 4520)).
+        """
+        if self._normal:
+            time.sleep_ms(self._wait_first_sample_ms())
+        else:
+            self._start_forced()
+            time.sleep_us(self._conversion_time_us())
+        return self._compensate_all(
+            self._device.readInto(BME280_REGISTER_PRESSURE_DATA, self._data))
+
+    async def read_async(self, poll_status=False):
+        """
+        Versión asíncrona de `read_all`: dispara la conversión forzada y cede el
+        control al bucle de eventos mientras el sensor mide. En modo normal
+        solo lee la última conversión disponible.
+
+        Args:
+            poll_status (bool): Si es True espera solo el tiempo típico y luego
+                consulta el registro de estado (0xF3) hasta que la medición
+                termine, en lugar de esperar siempre el tiempo máximo.
+
+        Returns:
+            tuple: (temperatura, presion, humedad), igual que `read_all`.
+        """
+        if self._normal:
+            await asyncio.sleep_ms(self._wait_first_sample_ms())
+            return self._compensate_all(
+                self._device.readInto(BME280_REGISTER_PRESSURE_DATA, self._data))
+        self._start_forced()
+        await asyncio.sleep_ms(
+            (self._conversion_time_us(typical=poll_status) + 999) // 1000)
+        if poll_status:
+            while self._measuring():
+                await asyncio.sleep_ms(1)
+        return self._compensate_all(
+            self._device.readInto(BME280_REGISTER_PRESSURE_DATA, self._data))
+
+    def _compensate_all(self, d):
+        """
+        Compensa un bloque crudo de 8 bytes leído desde 0xF7.
+
+        Args:
+            d (bytearray): press_msb..hum_lsb tal como los entrega el sensor.
+
+        Returns:
+            tuple: (temperatura, presion, humedad) en centésimas de °C, Pa y centésimas de %.
+        """
+        adc_p = ((d[0] << 16) | (d[1] << 8) | d[2]) >> 4
+        adc_t = ((d[3] << 16) | (d[4] << 8) | d[5]) >> 4
+        adc_h = (d[6] << 8) | d[7]
+        t = self._compensate_temperature(adc_t)
+        p = self._compensate_pressure(adc_p) >> 8
+        h = (self._compensate_humidity(adc_h) * 100) >> 10
+        return t, p, h
+
     @property
     def temperature(self):
         """
@@ -329,10 +653,7 @@ class BME280:
         Returns:
             str: Temperatura (por ejemplo, '24.13C').
         """       
-        t = self.read_temperature()
-        ti = t // 100
-        td = t - ti * 100
-        return "{}.{:02d}C".format(ti, td)
+        return format_temperature(self.read_temperature())
 
     @property
     def pressure(self):
@@ -342,10 +663,7 @@ class BME280:
         Returns:
             str: Presión (por ejemplo, '1013.25hPa').
         """
-        p = self.read_pressure() // 256
-        pi = p // 100
-        pd = p - pi * 100
-        return "{}.{:02d}hPa".format(pi, pd)
+        return format_pressure(self.read_pressure() // 256)
 
     @property
     def humidity(self):
@@ -355,7 +673,4 @@ class BME280:
         Returns:
             str: Humedad (por ejemplo, '48.32%').
         """
-        h = self.read_humidity()
-        hi = h // 1024
-        hd = h * 100 // 1024 - hi * 100
-        return "{}.{:02d}%".format(hi, hd)
+        return format_humidity(self.read_humidity() * 100 // 1024)
@@ -0,0 +1,57 @@
+"""
+Conversión entre las lecturas numéricas del sistema y su representación en texto.
+
+Todas las magnitudes viajan como enteros en centésimas de su unidad de
+presentación: temperatura en centésimas de °C, presión en Pa (centésimas de hPa)
+y humedad en centésimas de %. Así se evita usar flotantes y cadenas en el camino
+de cada muestra; solo se formatea al escribir la SD o la pantalla.
+"""
+
+def formatear_centi(valor, decimales=2):
+    """
+    Formatea un entero en centésimas como número decimal.
+
+    Args:
+        valor (int): Valor en centésimas (por ejemplo, 2413).
+        decimales (int): 1 o 2 decimales en la salida.
+
+    Returns:
+        str: Número formateado (por ejemplo, '24.13' o '24.1').
+    """
+    signo = '-' if valor < 0 else ''
+    valor = -valor if valor < 0 else valor
+    entero = valor // 100
+    frac = valor - entero * 100
+    if decimales == 1:
+        return "{}{}.{}".format(signo, entero, frac // 10)
+    return "{}{}.{:02d}".format(signo, entero, frac)
+
+def parsear_centi(texto):
+    """
+    Convierte un número decimal en texto a entero en centésimas, sin pasar por float.
+
+    Acepta también las cadenas con unidad de versiones anteriores
+    (por ejemplo, '24.13C' o '1013.25hPa').
+
+    Args:
+        texto (str): Número en texto.
+
+    Returns:
+        int: Valor en centésimas.
+
+    Raises:
+        ValueError: Si el texto no contiene un número válido.
+    """
+    texto = texto.strip()
+    fin = len(texto)
+    while fin and texto[fin - 1] not in '0123456789':
+        fin -= 1
+    texto = texto[:fin]
+    negativo = texto.startswith('-')
+    if negativo:
+        texto = texto[1:]
+    entero, _, frac = texto.partition('.')
+    if not entero and not frac:
+        raise ValueError('Valor numérico vacío')
+    valor = int(entero or '0') * 100 + int((frac + '00')[:2])
+    return -valor if negativo else valor
@@ -0,0 +1,115 @@
+"""
+Pruebas de la paginación del historial por intervalo de `WebSocketServer`,
+sin red: las tramas se capturan en lugar de escribirse en un socket.
+
+Se ejecutan en el PC: `network`, `ubinascii` y `uasyncio` solo se sustituyen
+si no existen.
+"""
+
+import os
+import sys
+import json
+import types
+import asyncio
+import binascii
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Raspberry'))
+sys.modules.setdefault('network', types.SimpleNamespace())
+sys.modules.setdefault('ubinascii', binascii)
+sys.modules.setdefault('uasyncio', asyncio)
+
+import comunicacion
+import protocolo_bin
+
+class SDFalsa:
+    """
+    Registros crudos en memoria con la interfaz de consulta de `SDLogger`.
+    """
+    sd_montada = True
+    generacion = 0
+    borrados = 0
+
+    def __init__(self, registros):
+        self.registros = registros
+        self.ultimo_registro = {0: registros[-1][0]}
+
+    def elegir_resolucion(self, inicio, fin):
+        return 0
+
+    def query(self, inicio, fin, limite=None, resolucion=None):
+        resultado = [r for r in self.registros if inicio <= r[0] <= fin]
+        return resultado[:limite] if limite else resultado
+
+def carga(datos):
+    """
+    Devuelve la carga útil de una trama de servidor (sin máscara).
+    """
+    n = datos[1] & 0x7F
+    inicio = 2 if n < 126 else 4 if n == 126 else 10
+    return bytes(datos[inicio:])
+
+class PaginacionHistorial(unittest.TestCase):
+
+    def pedir_todo(self, registros, limite):
+        """
+        Pide [0, 10**6] siguiendo el cursor hasta `fin`, como la aplicación.
+
+        Returns:
+            tuple: (epochs recibidos, número de páginas pedidas).
+        """
+        servidor = comunicacion.WebSocketServer(SDFalsa(registros))
+        writer = object()
+        servidor.connections[writer] = 'consulta'
+        tramas = []
+
+        async def capturar(w, datos, vivo=False):
+            tramas.append(datos)
+
+        servidor._write = capturar
+        consulta = {'solicitud': 'historial', 'desde': 0, 'hasta': 10 ** 6, 'limite': limite}
+        recibidos, paginas = [], 0
+        while paginas < 50:
+            paginas += 1
+            asyncio.run(servidor._enviar_rango(writer, consulta))
+            for datos in tramas:
+                mensaje = json.loads(carga(datos))
+                recibidos.extend(r['t'] for r in mensaje['historial'])
+            tramas.clear()
+            if mensaje['fin']:
+                break
+            self.assertTrue(mensaje['truncado'])
+            consulta = dict(consulta, cursor=mensaje['cursor'])
+        return recibidos, paginas
+
+    def test_pagina_dentro_de_epochs_repetidos(self):
+        # La página de 4 termina a mitad de los cinco registros con t=1003
+        epochs = [1000, 1001, 1002, 1003, 1003, 1003, 1003, 1003, 1004, 1005]
+        registros = [(t - comunicacion.AJUSTE_UNIX, 2000 + i, 101325, 4500)
+                     for i, t in enumerate(epochs)]
+        recibidos, paginas = self.pedir_todo(registros, 4)
+        self.assertEqual(recibidos, epochs)
+        self.assertEqual(paginas, 3)
+
+    def test_mas_repetidos_que_el_limite(self):
+        epochs = [1000] + [1001] * 7 + [1002]
+        registros = [(t - comunicacion.AJUSTE_UNIX, 2000 + i, 101325, 4500)
+                     for i, t in enumerate(epochs)]
+        recibidos, paginas = self.pedir_todo(registros, 3)
+        self.assertEqual(recibidos, epochs)
+        self.assertEqual(paginas, 3)
+
+class UltimoDato(unittest.TestCase):
+
+    def test_enteros_hasta_la_trama(self):
+        servidor = comunicacion.WebSocketServer(SDFalsa([(0, 0, 0, 0)]))
+        servidor.ultimo_mensaje = {'temperatura': 2157, 'humedad': 4829,
+                                   'presion': 101325, 'condicion': 'nublado'}
+        self.assertEqual(json.loads(carga(servidor._trama_real())),
+                         {'temperatura': 21.57, 'humedad': 48.29,
+                          'presion': 1013.25, 'condicion': 'nublado'})
+        self.assertEqual(carga(servidor._trama_real(True)),
+                         bytes(protocolo_bin.empaquetar_muestra(2157, 4829, 101325, 'nublado')))
+
+if __name__ == '__main__':
+    unittest.main()
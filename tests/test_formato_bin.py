@@ -0,0 +1,37 @@
+"""
+Pruebas de la conversión de los archivos diarios binarios a CSV.
+"""
+
+import io
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Raspberry'))
+sys.modules.setdefault('machine', types.SimpleNamespace(I2C=object))
+sys.modules.setdefault('uos', os)
+sys.modules.setdefault('sdcard', types.SimpleNamespace(SDCard=lambda *args: None))
+
+import formato_bin
+import sd_logger
+
+class ConversionCSV(unittest.TestCase):
+
+    def test_mismo_formato_que_el_dispositivo(self):
+        registros = [(86400 + 60 * i, 2000 + i, 101325 - i, 4500) for i in range(5)]
+        binario = bytearray(formato_bin.cabecera(1970))
+        for registro in registros:
+            bloque = bytearray(formato_bin.TAM_REGISTRO)
+            formato_bin.empaquetar_en(bloque, 0, *registro)
+            binario += bloque
+        salida = io.StringIO()
+        self.assertEqual(formato_bin.convertir_a_csv(io.BytesIO(binario), salida), 5)
+        lineas = salida.getvalue().splitlines(True)
+        self.assertEqual(lineas[0], formato_bin.CABECERA_CSV)
+        # Cada línea lleva el CRC que comprueba el lector del dispositivo
+        self.assertEqual([sd_logger.parsear_linea(linea, 86400) for linea in lineas[1:]],
+                         registros)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Pruebas del registro en la SD con un reloj simulado, sobre un directorio
+temporal que hace de punto de montaje.
+
+Se ejecutan en el PC: `machine`, `uos` y `sdcard` solo se sustituyen si no existen.
+"""
+
+import os
+import sys
+import time
+import types
+import calendar
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Raspberry'))
+sys.modules.setdefault('machine', types.SimpleNamespace(I2C=object))
+sys.modules.setdefault('uos', os)
+sys.modules.setdefault('sdcard', types.SimpleNamespace(SDCard=lambda *args: None))
+
+import sd_logger
+
+class Reloj:
+    """
+    Sustituto del módulo `time` de MicroPython con la hora fijada a mano.
+    """
+
+    def __init__(self, *fecha):
+        self.fijar(*fecha)
+
+    def fijar(self, *fecha):
+        self.t = calendar.timegm(fecha + (0,) * (6 - len(fecha)))
+
+    def time(self):
+        return self.t
+
+    def localtime(self, t=None):
+        return time.gmtime(self.t if t is None else t)[:8]
+
+    def gmtime(self, t=None):
+        return time.gmtime(self.t if t is None else t)[:8]
+
+    def mktime(self, fecha):
+        return calendar.timegm(tuple(fecha)[:6])
+
+class Uos:
+    """
+    `uos` sobre el sistema de archivos del PC, sin montajes reales.
+    """
+    listdir = staticmethod(os.listdir)
+    stat = staticmethod(os.stat)
+    remove = staticmethod(os.remove)
+    rename = staticmethod(os.rename)
+
+    def mount(self, *args):
+        pass
+
+    def umount(self, *args):
+        raise OSError
+
+    def statvfs(self, ruta):
+        r = os.statvfs(ruta)
+        return (r.f_frsize, r.f_frsize, r.f_blocks, r.f_bavail, r.f_bavail, 0, 0, 0, 0, 255)
+
+class Machine:
+    """
+    Lo mínimo de `machine` que usa `SDLogger` para preparar el bus SPI.
+    """
+
+    class Pin:
+        OUT = 1
+
+        def __init__(self, *args):
+            pass
+
+    @staticmethod
+    def SPI(*args, **kwargs):
+        return None
+
+class PruebaSD(unittest.TestCase):
+    formato = 'bin'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        # Arranque en frío: el RTC vuelve a la fecha por defecto
+        self.reloj = Reloj(2021, 1, 1, 0, 0, 5)
+        sd_logger.time = self.reloj
+        sd_logger.os = Uos()
+        sd_logger.machine = Machine
+        self.sd = sd_logger.SDLogger(0, 0, 0, 0, 0, formato=self.formato)
+        self.sd.mount_point = self.dir
+        self.sd.init_sd()
+
+    def registrar(self, n):
+        for i in range(n):
+            self.reloj.t += 60
+            self.sd.log_data(2000 + i, 101325, 4500)
+        self.sd.flush()
+
+class RotacionDiaria(PruebaSD):
+
+    def test_leer_ultimo_dato_no_crea_archivo(self):
+        self.assertIsNone(self.sd.leer_ultimo_dato())
+        self.assertEqual(os.listdir(self.dir), [])
+        self.reloj.fijar(2026, 10, 1, 12)
+        self.registrar(3)
+        self.assertEqual(self.sd.archivos_registro(), ['lecturas_2026-10-01.bin'])
+        self.assertEqual(len(self.sd.query(self.reloj.t - 3600, self.reloj.t)), 3)
+
+    def test_rota_con_la_fecha_completa(self):
+        self.sd.check_daily_file()
+        # La sincronización lleva a otro día 1: mismo día del mes, otra fecha
+        self.reloj.fijar(2026, 10, 1, 12)
+        self.registrar(3)
+        self.assertEqual(self.sd.archivos_registro(),
+                         ['lecturas_2021-01-01.bin', 'lecturas_2026-10-01.bin'])
+        registros = self.sd.query(self.reloj.t - 3600, self.reloj.t)
+        self.assertEqual([r[1] for r in registros], [2000, 2001, 2002])
+
+class ConsultaCSV(PruebaSD):
+    formato = 'csv'
+
+    def test_rango_con_indice(self):
+        self.reloj.fijar(2026, 10, 1, 12)
+        inicio = self.reloj.t
+        self.registrar(300)
+        self.assertGreater(os.path.getsize(self.sd.filepath + ".idx"),
+                           4 * sd_logger.TAM_INDICE)
+        desde, hasta = inicio + 60 * 150, inicio + 60 * 160
+        registros = self.sd.query(desde, hasta)
+        self.assertEqual([r[0] for r in registros], list(range(desde, hasta + 1, 60)))
+        self.assertEqual(registros[0][1], 2149)
+
+if __name__ == '__main__':
+    unittest.main()
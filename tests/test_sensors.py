@@ -0,0 +1,100 @@
+"""
+Pruebas de la compensación del BME280 con el ejemplo resuelto del datasheet
+de Bosch (sección de cálculo de compensación en enteros).
+
+Se ejecutan en el PC: `machine` y `uasyncio` solo se sustituyen si no existen.
+"""
+
+import os
+import sys
+import types
+import shutil
+import struct
+import asyncio
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'Raspberry'))
+sys.modules.setdefault('machine', types.SimpleNamespace(I2C=object))
+sys.modules.setdefault('uasyncio', asyncio)
+
+import sensors
+
+CALIBRACION = {
+    'dig_T1': 27504, 'dig_T2': 26435, 'dig_T3': -1000,
+    'dig_P1': 36477, 'dig_P2': -10685, 'dig_P3': 3024,
+    'dig_P4': 2855, 'dig_P5': 140, 'dig_P6': -7,
+    'dig_P7': 15500, 'dig_P8': -14600, 'dig_P9': 6000,
+}
+
+def sensor_de_ejemplo():
+    bme = object.__new__(sensors.BME280)
+    for nombre, valor in CALIBRACION.items():
+        setattr(bme, nombre, valor)
+    return bme
+
+class CompensacionDatasheet(unittest.TestCase):
+
+    def test_temperatura(self):
+        bme = sensor_de_ejemplo()
+        self.assertEqual(bme._compensate_temperature(519888), 2508)
+        self.assertEqual(bme.t_fine, 128422)
+
+    def test_presion(self):
+        bme = sensor_de_ejemplo()
+        bme._compensate_temperature(519888)
+        # Datasheet: 100653.27 Pa (Q24.8 / 256)
+        self.assertAlmostEqual(bme._compensate_pressure(415148) / 256, 100653.27, delta=0.05)
+
+class BME280Falso:
+    """
+    Registros de calibración de un BME280 con la interfaz de `Device`.
+    """
+
+    def __init__(self, dig_T1):
+        self.regs = bytearray(256)
+        self.regs[sensors.BME280_REGISTER_CHIPID] = 0x60
+        struct.pack_into(sensors.BME280_CALIB_TP_FORMAT, self.regs,
+                         sensors.BME280_REGISTER_DIG_T1, dig_T1, 26435, -1000,
+                         36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000, 0, 75)
+        self.lecturas = 0
+
+    def readU8(self, register):
+        return self.regs[register]
+
+    def readInto(self, register, buf):
+        self.lecturas += 1
+        buf[:] = self.regs[register:register + len(buf)]
+        return buf
+
+class CacheCalibracion(unittest.TestCase):
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        self.ruta = os.path.join(directorio, 'calib.bin')
+
+    def cargar(self, device):
+        bme = object.__new__(sensors.BME280)
+        bme._device = device
+        bme._address = sensors.BME280_I2CADDR
+        bme._load_calibration(self.ruta)
+        return bme
+
+    def test_usa_la_cache_del_mismo_modulo(self):
+        self.cargar(BME280Falso(27504))
+        device = BME280Falso(27504)
+        self.assertEqual(self.cargar(device).dig_T1, 27504)
+        # Solo la comprobación de los coeficientes de temperatura
+        self.assertEqual(device.lecturas, 1)
+
+    def test_descarta_la_cache_de_otro_modulo(self):
+        self.cargar(BME280Falso(27504))
+        self.assertEqual(self.cargar(BME280Falso(28000)).dig_T1, 28000)
+        # La caché queda actualizada con el módulo nuevo
+        device = BME280Falso(28000)
+        self.assertEqual(self.cargar(device).dig_T1, 28000)
+        self.assertEqual(device.lecturas, 1)
+
+if __name__ == '__main__':
+    unittest.main()